@@ -1,20 +1,49 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from config import Config
+from config import get_config
+from app.cache import Cache
+from app.jobs import JobQueue
+from app.user_cache import UserCache
+from app.security import LoginSecurity
+from app.metrics import MeteredQueuePool, configure_pool
+from app.instrumentation import Instrumentation
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
+cache = Cache()
+jobs = JobQueue()
+user_cache = UserCache()
+login_security = LoginSecurity()
+instrumentation = Instrumentation()
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(config_class)
+    app.config.from_object(config_class or get_config())
+    
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=1)
+    
+    if app.config['DB_POOL_METRICS']:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+            app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}), poolclass=MeteredQueuePool
+        )
     
     db.init_app(app)
+    with app.app_context():
+        configure_pool(db.engine, app.config)
+        from app.sqlite import init_sqlite
+        init_sqlite(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    cache.init_app(app)
+    jobs.init_app(app)
+    user_cache.init_app(app)
+    login_security.init_app(app)
+    instrumentation.init_app(app)
     
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Будь ласка, увійдіть для доступу до цієї сторінки.'
@@ -24,15 +53,21 @@ def create_app(config_class=Config):
     from app.routes.patients import patients
     from app.routes.admin import admin
     from app.routes.export import export_bp
+    from app.routes.imports import imports
+    from app.routes.stats import stats
+    from app.routes.api import api
     
     app.register_blueprint(auth)
     app.register_blueprint(patients)
     app.register_blueprint(admin)
     app.register_blueprint(export_bp)
+    app.register_blueprint(imports)
+    app.register_blueprint(stats)
+    app.register_blueprint(api)
     
     return app
 
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
\ No newline at end of file
+    # Знімок з кешу процесу: без запиту до бази на кожному запиті
+    return user_cache.load(int(user_id))
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Архів виписаних пацієнтів (холодне сховище).
+
+Пацієнти, чиє перебування завершилось (виписка, для померлих без
+виписки - смерть) раніше ніж ARCHIVE_AFTER_MONTHS місяців тому,
+переносяться з patients у patients_archive командою `flask archive`
+(запускається за розкладом, див. DOCKER_SETUP.md). Активна таблиця та
+її індекси лишаються малими, тож список, пошук і фасети не платять за
+роки історії.
+
+Архів прозоро враховується там, де потрібні всі дані: експорт
+(app/exporters.py), місячна статистика (app/stats.py), зайнятість ліжок
+(app/census.py) і перевірка унікальності номера історії (форма,
+імпорт, JSON API). Список пацієнтів, пошук і API показують лише
+активну таблицю.
+
+Перенесення не змінює даних пацієнта, тому не пишеться в журнал змін
+(app/changes.py) і не перераховує статистику. id зберігається, тож
+`flask restore-archive` повертає пацієнта під тим самим id. Таблиця
+patients у SQLite має AUTOINCREMENT (див. schema.rebuild_autoincrement),
+тож id перенесених пацієнтів новим записам не видаються.
+"""
+from datetime import date, datetime
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.events import patient_months, patients_changed
+
+# Спільні колонки активної таблиці та архіву
+COLUMNS = tuple(column.key for column in Patient.__table__.columns)
+
+
+def archive_cutoff(months, today=None):
+    """Перше число місяця, що на months місяців раніше поточного"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archivable(model, cutoff):
+    """Умова: перебування завершилось до cutoff"""
+    return db.or_(
+        model.discharge_date < cutoff,
+        db.and_(model.discharge_date.is_(None), model.is_deceased == True, model.death_date < cutoff),
+    )
+
+
+def _move(source, target, ids, **values):
+    """
+    Переносить рядки ids з source у target однією парою INSERT ... SELECT
+    і DELETE (без commit). values - додаткові колонки target
+    """
+    table = source.__table__
+    select = db.select(*(table.c[name] for name in COLUMNS),
+                       *(db.literal(value).label(name) for name, value in values.items()))
+    db.session.execute(target.__table__.insert().from_select(
+        COLUMNS + tuple(values), select.where(table.c.id.in_(ids))
+    ))
+    db.session.execute(table.delete().where(table.c.id.in_(ids)))
+
+
+def _move_batches(source, target, query, batch_size, **values):
+    """
+    Переносить рядки запиту порціями, кожна - окремою транзакцією.
+    Повертає (кількість, зачеплені місяці)
+    """
+    moved, months = 0, set()
+    while True:
+        rows = query.limit(batch_size).all()
+        if not rows:
+            break
+        _move(source, target, [row.id for row in rows], **values)
+        db.session.commit()
+        moved += len(rows)
+        months |= patient_months(*rows)
+    return moved, months
+
+
+def _dates(model):
+    return db.session.query(model.id, model.admission_date, model.discharge_date, model.death_date)
+
+
+def pending_count(months):
+    """Скільки пацієнтів перенесе archive_patients(months)"""
+    cutoff = archive_cutoff(months)
+    return Patient.query.filter(archivable(Patient, cutoff)).count()
+
+
+def archive_patients(months, batch_size=500):
+    """Переносить в архів пацієнтів, виписаних до archive_cutoff(months). Повертає кількість"""
+    cutoff = archive_cutoff(months)
+    # Без ORDER BY: перенесені рядки зникають з таблиці, і кожна наступна
+    # порція читається з початку індексу дат
+    query = _dates(Patient).filter(archivable(Patient, cutoff))
+    moved, touched = _move_batches(Patient, ArchivedPatient, query, batch_size,
+                                   archived_at=datetime.utcnow())
+    if moved:
+        patients_changed(touched, refresh_stats=False)
+    return moved
+
+
+def restore_patients(condition, batch_size=500):
+    """
+    Повертає з архіву пацієнтів, що відповідають умові над ArchivedPatient.
+    Пацієнти, чий номер історії або id уже зайняті в активній таблиці,
+    лишаються в архіві. Повертає (кількість, номери історій пропущених)
+    """
+    taken = db.exists().where(db.or_(Patient.history_number == ArchivedPatient.history_number,
+                                     Patient.id == ArchivedPatient.id))
+    query = _dates(ArchivedPatient).filter(condition, ~taken)
+    restored, touched = _move_batches(ArchivedPatient, Patient, query, batch_size)
+    if restored:
+        patients_changed(touched, refresh_stats=False)
+    conflicts = [number for (number,) in
+                 db.session.query(ArchivedPatient.history_number).filter(condition)]
+    return restored, conflicts
@@ -0,0 +1,194 @@
+"""
+Кеш застосунку.
+
+За замовчуванням - LRU-кеш у пам'яті процесу з часом життя записів.
+Для кількох воркерів можна підключити спільний Redis (CACHE_TYPE=redis),
+тоді інвалідація з одного процесу видна всім іншим.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """LRU-кеш у пам'яті процесу з TTL"""
+
+    def __init__(self, maxsize=1024, default_timeout=300):
+        self.maxsize = maxsize
+        self.default_timeout = default_timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires = item
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        """timeout=0 - без обмеження часу життя"""
+        timeout = self.default_timeout if timeout is None else timeout
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, timeout=None):
+        """Записує значення, лише якщо ключа ще немає. Повертає True при записі"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and not (item[1] and item[1] < time.monotonic()):
+                return False
+            self.set(key, value, timeout)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (0, None))
+            self._data[key] = (value + 1, expires)
+            self._data.move_to_end(key)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'backend': 'memory', 'hits': self.hits, 'misses': self.misses,
+                'size': len(self._data), 'maxsize': self.maxsize}
+
+
+class RedisCache:
+    """Спільний кеш у Redis (потрібен пакет redis)"""
+
+    def __init__(self, url, default_timeout=300, prefix='hospital:'):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError('CACHE_TYPE=redis потребує пакета redis: pip install redis') from exc
+
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def add(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        return bool(self._client.set(self.prefix + key, pickle.dumps(value),
+                                     ex=timeout or None, nx=True))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def incr(self, key):
+        # Лічильники зберігаємо як pickle, щоб get() повертав int
+        with self._client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.prefix + key)
+                    raw = pipe.get(self.prefix + key)
+                    value = pickle.loads(raw) + 1 if raw is not None else 1
+                    pipe.multi()
+                    pipe.set(self.prefix + key, pickle.dumps(value))
+                    pipe.execute()
+                    return value
+                except self._watch_error:
+                    continue
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+    def stats(self):
+        return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses}
+
+
+class Cache:
+    """Обгортка над бекендом кешу, налаштовується з конфігурації в create_app"""
+
+    def __init__(self):
+        self.backend = MemoryCache()
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        if cache_type == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'], default_timeout=timeout)
+        else:
+            self.backend = MemoryCache(maxsize=app.config.get('CACHE_MAXSIZE', 1024),
+                                       default_timeout=timeout)
+
+    @property
+    def shared(self):
+        """Чи бачать записи (і bump версій) усі процеси застосунку"""
+        return isinstance(self.backend, RedisCache)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.backend.set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        return self.backend.add(key, value, timeout)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
+
+    def version(self, name):
+        """
+        Поточна версія набору даних. Версія входить у ключі кешу, тому
+        після bump() старі записи просто перестають використовуватись.
+        Початкове значення - час у наносекундах, щоб після витіснення
+        лічильника нова версія не збіглась зі старою.
+        """
+        key = 'version:' + name
+        value = self.get(key)
+        if value is None:
+            self.add(key, time.time_ns(), timeout=0)
+            value = self.get(key)
+        return value
+
+    def bump(self, name):
+        key = 'version:' + name
+        if self.get(key) is None:
+            self.add(key, time.time_ns(), timeout=0)
+        return self.backend.incr(key)
@@ -0,0 +1,183 @@
+"""
+Щоденна зайнятість ліжок (census) за відділеннями.
+
+Пацієнт присутній у день d, якщо admission_date <= d < кінець
+перебування. Кінець - дата виписки, для померлих без виписки - дата
+смерті, ті, хто ще лікується, присутні до сьогодні включно.
+
+Замість запиту на кожен день (O(днів × пацієнтів)) пацієнти періоду
+читаються одним запитом, а зайнятість рахується «лінією розгортки»:
++1 у день поступлення, -1 у день виписки, накопичена сума по днях
+(NumPy, O(пацієнтів + днів × відділень)). Результат місяця кешується;
+ключ включає версію таблиці пацієнтів, бо зміна одного пацієнта може
+зачепити всі місяці його перебування. Перебування з архіву
+(app/archive.py) читаються тими самими запитами.
+
+NumPy імпортується під час першого розрахунку, щоб не сповільнювати
+старт кожного воркера.
+"""
+from datetime import date, timedelta
+from flask import current_app
+from app import db, cache
+from app.models import Patient, ArchivedPatient
+from app.queries import filter_patients, month_range
+from app.sqlite import read_session
+
+
+class Census:
+    """Зайнятість по днях: counts[відділення][день], days - список дат"""
+
+    def __init__(self, days, departments, counts):
+        self.days = days
+        self.departments = departments
+        self.counts = counts
+
+    @property
+    def totals(self):
+        import numpy as np
+
+        return self.counts.sum(axis=0) if len(self.departments) else np.zeros(len(self.days), dtype=np.int64)
+
+    def summary(self):
+        """Максимум і середнє за період для кожного відділення"""
+        return [
+            {'department': department, 'max': int(row.max()), 'avg': round(float(row.mean()), 1)}
+            for department, row in zip(self.departments, self.counts)
+        ]
+
+    def to_dict(self):
+        return {
+            'days': [day.isoformat() for day in self.days],
+            'departments': {
+                department: row.tolist() for department, row in zip(self.departments, self.counts)
+            },
+            'totals': self.totals.tolist(),
+            'summary': self.summary(),
+        }
+
+
+def stay_end(model=Patient):
+    """Кінець перебування: виписка, для померлих без виписки - смерть"""
+    return db.case(
+        (model.discharge_date.isnot(None), model.discharge_date),
+        (model.is_deceased == True, model.death_date),
+        else_=None
+    )
+
+
+def _day_numbers(values, default):
+    """ISO-дати (рядки або None) у номери днів NumPy; None - default"""
+    import numpy as np
+
+    days = np.array(values, dtype='datetime64[D]')
+    days[np.isnat(days)] = default
+    return days.astype(np.int64)
+
+
+def _overlap_conditions(model, start, end):
+    """
+    Умови двох запитів по індексу (discharge_date, admission_date):
+    завершені перебування і ті, що ще тривають. Обидві межі перевіряються
+    в самому індексі, тож до таблиці йдуть лише рядки, що перетинають період.
+    """
+    closed = (model.discharge_date > start, model.admission_date < end)
+    still_open = (
+        model.discharge_date.is_(None),
+        model.admission_date < end,
+        db.or_(model.is_deceased.isnot(True), model.death_date.is_(None), model.death_date > start)
+    )
+    return closed, still_open
+
+
+def _stays(model, start, end):
+    """
+    Запити перебувань, що перетинають період: (відділення, поступлення, кінець).
+    Дати читаються рядками і розбираються NumPy цілим масивом - на роках
+    даних це в рази швидше, ніж об'єкт date на кожен рядок
+    """
+    columns = (model.department,
+               db.cast(model.admission_date, db.String),
+               db.cast(stay_end(model), db.String))
+    return [db.select(*columns).filter(*conditions)
+            for conditions in _overlap_conditions(model, start, end)]
+
+
+def stays_fingerprint(start, end):
+    """
+    Відбиток перебувань, що перетинають період, в обох таблицях: кількість
+    і остання зміна (updated_at, для архіву - archived_at). На відміну від
+    period_fingerprint враховує й пацієнтів, що поступили раніше, - зміна
+    їхньої виписки змінює зайнятість періоду. Якщо період ще не скінчився,
+    додається сьогоднішня дата: ті, хто лікується, присутні до сьогодні.
+    """
+    parts = []
+    for model, changed in ((Patient, Patient.updated_at), (ArchivedPatient, ArchivedPatient.archived_at)):
+        for conditions in _overlap_conditions(model, start, end):
+            count, last = db.session.execute(
+                db.select(db.func.count(), db.func.max(changed)).select_from(model).filter(*conditions)
+            ).one()
+            parts.append(f'{count}:{last.isoformat() if last else ""}')
+    if end > date.today():
+        parts.append(date.today().isoformat())
+    return ':'.join(parts)
+
+
+def compute_census(start, end, department='', doctor=''):
+    """Зайнятість за напіввідкритий період [start, end)"""
+    import numpy as np
+
+    days_count = (end - start).days
+    days = [start + timedelta(days=offset) for offset in range(days_count)]
+
+    # Через з'єднання напряму, без ORM-обробки кожного рядка
+    connection = read_session().connection()
+    rows = []
+    for model in (Patient, ArchivedPatient):
+        for query in _stays(model, start, end):
+            query = filter_patients(query, department=department, doctor=doctor, model=model)
+            rows.extend(connection.execute(query).all())
+    if not rows:
+        return Census(days, [], np.zeros((0, days_count), dtype=np.int64))
+
+    names, admissions, discharges = zip(*rows)
+    codes = {}
+    dept_index = np.fromiter((codes.setdefault(name, len(codes)) for name in names),
+                             dtype=np.int64, count=len(rows))
+    origin = np.datetime64(start, 'D').astype(np.int64)
+    # Ті, хто ще лікується, присутні до сьогодні включно
+    open_end = np.datetime64(date.today() + timedelta(days=1), 'D')
+    # День поступлення і день виписки як зсув від початку періоду, обмежені періодом
+    first = np.clip(_day_numbers(admissions, open_end) - origin, 0, days_count)
+    last = np.clip(_day_numbers(discharges, open_end) - origin, 0, days_count)
+
+    # Лінія розгортки: +1 у день поступлення, -1 у день виписки, накопичена сума
+    delta = np.zeros((len(codes), days_count + 1), dtype=np.int64)
+    np.add.at(delta, (dept_index, first), 1)
+    np.add.at(delta, (dept_index, last), -1)
+    counts = np.cumsum(delta, axis=1)[:, :days_count]
+
+    # Відділення за абеткою
+    departments = sorted(codes)
+    return Census(days, departments, counts[[codes[name] for name in departments]])
+
+
+def month_census(year, month, department='', doctor=''):
+    """Зайнятість за місяць з кешу"""
+    key = 'census:{}-{:02d}:{}:{}:{}'.format(year, month, department, doctor, cache.version('patients'))
+    census = cache.get(key)
+    if census is None:
+        start, end = month_range(year, month)
+        census = compute_census(start, end, department=department, doctor=doctor)
+        cache.set(key, census, timeout=current_app.config['CENSUS_CACHE_TIMEOUT'])
+    return census
+
+
+def census_sheet(year, month, department='', doctor=''):
+    """Аркуш для експорту: (назва, заголовки, рядки) - день × відділення та всього"""
+    census = month_census(year, month, department=department, doctor=doctor)
+    headers = ['Дата'] + census.departments + ['Всього']
+    rows = (
+        [day.strftime('%d.%m.%Y')] + [int(value) for value in census.counts[:, i]] + [int(total)]
+        for i, (day, total) in enumerate(zip(census.days, census.totals))
+    )
+    return 'Зайнятість ліжок', headers, rows
@@ -0,0 +1,86 @@
+"""
+Журнал змін пацієнтів для інкрементальної синхронізації.
+
+Кожне додавання, редагування та видалення (маршрути, JSON API, імпорт)
+пише рядок у patient_changes у тій самій транзакції, що й сама зміна,
+тож журнал не розходиться з даними. Споживач (сховище звітів) запам'ятовує
+seq останньої прочитаної зміни і наступного разу забирає лише нові -
+через /api/v1/changes?since=N або `flask changes --since N`.
+
+У SQLite записи серіалізовані, і seq фіксуються в порядку зростання.
+У PostgreSQL транзакція з меншим seq може завершитись пізніше за
+сусідню, тому стрічка віддає лише зміни, старші за CHANGES_FEED_DELAY
+секунд, - інакше споживач міг би пропустити запізнілий рядок.
+"""
+from datetime import date, datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import PatientChange
+
+SNAPSHOT_FIELDS = (
+    'admission_date', 'discharge_date', 'full_name', 'department', 'doctor',
+    'history_number', 'comment', 'is_deceased', 'death_date'
+)
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def snapshot(patient):
+    """Поля пацієнта (об'єкт або словник) у вигляді JSON-сумісного словника"""
+    get = patient.get if isinstance(patient, dict) else lambda name: getattr(patient, name)
+    return {name: _json_value(get(name)) for name in SNAPSHOT_FIELDS}
+
+
+def record_changes(operation, patients, user_id):
+    """
+    Додає зміни до поточної транзакції (без commit).
+    patients - об'єкти Patient або словники з ключем id; id вже мають бути
+    присвоєні (після flush для нових).
+    """
+    rows = []
+    now = datetime.utcnow()
+    for patient in patients:
+        patient_id = patient['id'] if isinstance(patient, dict) else patient.id
+        rows.append({
+            'patient_id': patient_id,
+            'operation': operation,
+            'data': snapshot(patient),
+            'user_id': user_id,
+            'changed_at': now,
+        })
+    if rows:
+        db.session.execute(PatientChange.__table__.insert(), rows)
+
+
+def _feed_query(since):
+    query = PatientChange.query.filter(PatientChange.seq > since)
+    delay = current_app.config['CHANGES_FEED_DELAY']
+    if delay:
+        query = query.filter(PatientChange.changed_at <= datetime.utcnow() - timedelta(seconds=delay))
+    return query.order_by(PatientChange.seq)
+
+
+def to_dict(change):
+    return {
+        'seq': change.seq,
+        'patient_id': change.patient_id,
+        'operation': change.operation,
+        'data': change.data,
+        'user_id': change.user_id,
+        'changed_at': change.changed_at.isoformat(),
+    }
+
+
+def changes_since(since, limit):
+    """Сторінка змін після seq since: (зміни, чи є ще)"""
+    rows = _feed_query(since).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def iter_changes(since, batch_size=1000):
+    """Усі зміни після since порціями, з постійним споживанням пам'яті"""
+    return _feed_query(since).yield_per(batch_size)
@@ -0,0 +1,38 @@
+"""
+Реакція на зміни пацієнтів.
+
+Маршрути додавання/редагування/видалення та імпорт після commit
+викликають patients_changed() з переліком зачеплених місяців,
+щоб кеші похідних даних (фільтри, лічильники) перестали бути актуальними,
+а місячна статистика (app/stats.py) була перерахована.
+"""
+from app import cache
+
+
+def month_key(year, month):
+    return f'patients:{year}-{month:02d}'
+
+
+def patient_months(*patients):
+    """Місяці (рік, місяць), яких стосуються дати пацієнта"""
+    months = set()
+    for patient in patients:
+        for value in (patient.admission_date, patient.discharge_date, patient.death_date):
+            if value:
+                months.add((value.year, value.month))
+    return months
+
+
+def patients_changed(months, refresh_stats=True):
+    """
+    Інвалідація кешів для змінених місяців та таблиці в цілому, оновлення
+    статистики. refresh_stats=False - дані не змінились, лише перенесені
+    між таблицями (архів)
+    """
+    from app.stats import refresh_months
+
+    for year, month in months:
+        cache.bump(month_key(year, month))
+    cache.bump('patients')
+    if refresh_stats:
+        refresh_months(months)
@@ -0,0 +1,507 @@
+"""
+Потоковий експорт пацієнтів.
+
+Записи читаються з бази порціями (yield_per, на PostgreSQL - серверний
+курсор) у вигляді простих кортежів без ORM-об'єктів і одразу пишуться
+у файл потрібного формату:
+
+- xlsx: книга XlsxWriter у режимі constant_memory. Ширина колонок
+  рахується під час запису, тож дані не проходять вдруге;
+- csv: UTF-8 з BOM і роздільником ';', як очікує Excel з українською
+  локаллю; віддається клієнту потоком;
+- ndjson: один JSON-об'єкт на рядок з ISO-датами; віддається потоком;
+- parquet: колонковий формат зі стисненням zstd, пишеться групами рядків.
+
+Excel і CSV отримують відформатовані значення (format_row), машинні
+формати - типізовані значення з англійськими назвами полів.
+Експорт за місяць включає пацієнтів з архіву (app/archive.py).
+
+Період з кількох місяців (річний звіт) читається одним запитом,
+впорядкованим за групою, і пишеться в одну книгу: аркуш на кожен місяць
+або відділення плюс «Підсумок» (write_xlsx_split).
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from urllib.parse import quote
+from flask import Response
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.queries import filter_patients, month_range, period_fingerprint
+from app.sqlite import read_query
+
+HEADERS = [
+    'Дата поступлення', 'Дата виписки', 'ПІБ', 'Відділення', 'Лікар',
+    '№ Історії', 'Коментар', 'Статус', 'Створено', 'Оновлено'
+]
+
+EXPORT_COLUMNS = (
+    Patient.admission_date, Patient.discharge_date, Patient.full_name,
+    Patient.department, Patient.doctor, Patient.history_number,
+    Patient.comment, Patient.is_deceased, Patient.created_at, Patient.updated_at
+)
+
+FIELD_NAMES = [column.key for column in EXPORT_COLUMNS]
+
+MAX_COLUMN_WIDTH = 50
+
+# формат: (розширення, MIME-тип, віддається потоком)
+EXPORT_FORMATS = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', False),
+    'csv': ('.csv', 'text/csv', True),
+    'ndjson': ('.ndjson', 'application/x-ndjson', True),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet', False),
+}
+
+
+def format_row(row):
+    """Кортеж колонок EXPORT_COLUMNS -> значення для файлу експорту"""
+    (admission_date, discharge_date, full_name, department, doctor,
+     history_number, comment, is_deceased, created_at, updated_at) = row
+    return (
+        admission_date.strftime('%d.%m.%Y'),
+        discharge_date.strftime('%d.%m.%Y') if discharge_date else '',
+        full_name,
+        department,
+        doctor,
+        history_number,
+        comment or '',
+        'Помер' if is_deceased else 'Живий',
+        created_at.strftime('%d.%m.%Y %H:%M') if created_at else '',
+        updated_at.strftime('%d.%m.%Y %H:%M') if updated_at else '',
+    )
+
+
+def iter_patient_records(query, batch_size=1000):
+    """
+    Кортежі колонок EXPORT_COLUMNS, що читаються з бази порціями.
+    query вже має вибирати саме ці колонки (build_export_query)
+    """
+    return query.yield_per(batch_size)
+
+
+def iter_patient_rows(query, batch_size=1000):
+    """Відформатовані рядки запиту пацієнтів"""
+    for row in iter_patient_records(query, batch_size):
+        yield format_row(row)
+
+
+class SheetWriter:
+    """Аркуш XlsxWriter, що запам'ятовує найширше значення кожної колонки"""
+
+    def __init__(self, workbook, name, headers, header_format=None):
+        self.worksheet = workbook.add_worksheet(name)
+        self.widths = [len(header) for header in headers]
+        self.row_index = 0
+        self.write(headers, header_format)
+
+    def write(self, values, cell_format=None):
+        self.worksheet.write_row(self.row_index, 0, values, cell_format)
+        self.row_index += 1
+        widths = self.widths
+        for i, value in enumerate(values):
+            length = len(str(value))
+            if length > widths[i]:
+                widths[i] = length
+
+    def close(self):
+        for i, width in enumerate(self.widths):
+            self.worksheet.set_column(i, i, min(width + 2, MAX_COLUMN_WIDTH))
+
+    @property
+    def rows_written(self):
+        return self.row_index - 1
+
+
+def _workbook(path):
+    import xlsxwriter
+
+    return xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'strings_to_numbers': False,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+
+
+def _write_extra_sheets(workbook, extra_sheets, header_format):
+    for name, headers, extra_rows in extra_sheets:
+        extra = SheetWriter(workbook, name, headers, header_format)
+        for values in extra_rows:
+            extra.write(values)
+        extra.close()
+
+
+def write_xlsx(rows, path, sheet_name='Пацієнти', extra_sheets=()):
+    """
+    Записує рядки у файл .xlsx з постійним споживанням пам'яті. Повертає кількість рядків.
+    extra_sheets - додаткові аркуші (назва, заголовки, рядки) після основного
+    """
+    workbook = _workbook(path)
+    header_format = workbook.add_format({'bold': True})
+    sheet = SheetWriter(workbook, sheet_name, HEADERS, header_format)
+    for values in rows:
+        sheet.write(values)
+    sheet.close()
+    _write_extra_sheets(workbook, extra_sheets, header_format)
+    workbook.close()
+    return sheet.rows_written
+
+
+def _month_title(group):
+    year, month = group
+    return f'{MONTH_NAMES[month - 1]} {year}'
+
+
+# Розбиття книги на аркуші: (заголовок групи, ключ групи запису, назва аркуша)
+SPLITS = {
+    'month': ('Місяць', lambda record: (record[0].year, record[0].month), _month_title),
+    'department': ('Відділення', lambda record: record[3], str),
+}
+
+SUMMARY_HEADERS = ['Пацієнтів', 'Виписано', 'Померло', 'Середній ліжко-день']
+
+# Символи, заборонені в назві аркуша Excel
+INVALID_SHEET_CHARS = str.maketrans({char: ' ' for char in '[]:*?/\\'})
+
+
+def sheet_name(title, used):
+    """Допустима і унікальна (без урахування регістру) назва аркуша, до 31 символу"""
+    base = (title.translate(INVALID_SHEET_CHARS).strip(" '") or 'Аркуш')[:31]
+    name, number = base, 2
+    while name.lower() in used:
+        suffix = f' ({number})'
+        name = base[:31 - len(suffix)] + suffix
+        number += 1
+    used.add(name.lower())
+    return name
+
+
+def _summary_row(title, counters):
+    patients, discharged, deceased, stay_days = counters
+    return [title, patients, discharged, deceased,
+            round(stay_days / discharged, 1) if discharged else '']
+
+
+def write_xlsx_split(records, path, split, extra_sheets=()):
+    """
+    Книга .xlsx з аркушем на кожну групу (місяць або відділення) та
+    аркушем «Підсумок» за один прохід по записах. Записи мають надходити
+    впорядкованими за групою (build_export_query). Повертає кількість рядків.
+    """
+    label, group_of, title = SPLITS[split]
+    workbook = _workbook(path)
+    header_format = workbook.add_format({'bold': True})
+    used = {'підсумок'}
+    # Підсумок - перший аркуш книги, але заповнюється після даних:
+    # у constant_memory кожен аркуш пишеться у власний тимчасовий файл
+    summary = SheetWriter(workbook, 'Підсумок', [label] + SUMMARY_HEADERS, header_format)
+    groups = {}
+    sheet, current, count = None, None, 0
+    for record in records:
+        group = group_of(record)
+        if sheet is None or group != current:
+            if sheet is not None:
+                sheet.close()
+            sheet = SheetWriter(workbook, sheet_name(title(group), used), HEADERS, header_format)
+            current = group
+            counters = groups.setdefault(group, [0, 0, 0, 0])
+        sheet.write(format_row(record))
+        count += 1
+        counters[0] += 1
+        admission_date, discharge_date, is_deceased = record[0], record[1], record[7]
+        if discharge_date:
+            counters[1] += 1
+            counters[3] += (discharge_date - admission_date).days
+        if is_deceased:
+            counters[2] += 1
+    if sheet is not None:
+        sheet.close()
+
+    for group, counters in groups.items():
+        summary.write(_summary_row(title(group), counters))
+    total = [sum(values) for values in zip(*groups.values())] or [0, 0, 0, 0]
+    summary.write(_summary_row('Всього', total), header_format)
+    summary.close()
+    _write_extra_sheets(workbook, extra_sheets, header_format)
+    workbook.close()
+    return count
+
+
+def iter_csv(rows, flush_every=500):
+    """Частини CSV-файлу (bytes): BOM, заголовок, рядки порціями"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    writer.writerow(HEADERS)
+    yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for values in rows:
+        writer.writerow(values)
+        pending += 1
+        if pending == flush_every:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_ndjson(records, flush_every=500):
+    """Частини файлу JSON Lines (bytes) з типізованих записів"""
+    lines = []
+    for record in records:
+        item = {name: _json_value(value) for name, value in zip(FIELD_NAMES, record)}
+        lines.append(json.dumps(item, ensure_ascii=False))
+        if len(lines) == flush_every:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def write_parquet(records, path, row_group_size=10000):
+    """Записує типізовані записи у файл Parquet групами рядків. Повертає кількість рядків"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('admission_date', pa.date32()),
+        ('discharge_date', pa.date32()),
+        ('full_name', pa.string()),
+        ('department', pa.string()),
+        ('doctor', pa.string()),
+        ('history_number', pa.string()),
+        ('comment', pa.string()),
+        ('is_deceased', pa.bool_()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+    ])
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == row_group_size:
+                writer.write_table(_parquet_table(pa, schema, batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(_parquet_table(pa, schema, batch))
+            count += len(batch)
+    return count
+
+
+def _parquet_table(pa, schema, batch):
+    columns = list(zip(*batch))
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def write_export(file_format, query, path, track=None, extra_sheets=(), split=''):
+    """
+    Записує експорт у файл будь-якого формату. Повертає кількість рядків.
+    track - необов'язкова обгортка над ітератором записів (прогрес),
+    extra_sheets і split (аркуш на місяць або відділення) - лише для xlsx
+    """
+    records = iter_patient_records(query)
+    if track is not None:
+        records = track(records)
+
+    if file_format == 'parquet':
+        return write_parquet(records, path)
+    if file_format == 'xlsx' and split:
+        return write_xlsx_split(records, path, split, extra_sheets=extra_sheets)
+    if file_format == 'xlsx':
+        return write_xlsx(map(format_row, records), path, extra_sheets=extra_sheets)
+
+    counter = _Counter(records)
+    chunks = iter_ndjson(counter) if file_format == 'ndjson' else iter_csv(map(format_row, counter))
+    with open(path, 'wb') as output:
+        for chunk in chunks:
+            output.write(chunk)
+    return counter.count
+
+
+class _Counter:
+    """Ітератор-обгортка, що рахує пройдені елементи"""
+
+    def __init__(self, items):
+        self.items = items
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.count += 1
+            yield item
+
+
+def stream_export(file_format, query):
+    """Генератор частин потокового експорту (csv або ndjson)"""
+    if file_format == 'ndjson':
+        return iter_ndjson(iter_patient_records(query))
+    return iter_csv(iter_patient_rows(query))
+
+
+MONTH_NAMES = [
+    'Січень', 'Лютий', 'Березень', 'Квітень', 'Травень', 'Червень',
+    'Липень', 'Серпень', 'Вересень', 'Жовтень', 'Листопад', 'Грудень'
+]
+
+
+def is_range(params):
+    """Експорт за період з кількох місяців (end_year/end_month у параметрах)"""
+    return bool(params.get('end_year')) and \
+        (params['end_year'], params['end_month']) != (params['year'], params['month'])
+
+
+def export_period(params):
+    """Напіввідкритий діапазон дат поступлення [start, end) експорту"""
+    start, end = month_range(params['year'], params['month'])
+    if is_range(params):
+        end = month_range(params['end_year'], params['end_month'])[1]
+    return start, end
+
+
+def export_split(params):
+    """Розбиття книги на аркуші: '', 'month' або 'department' (лише xlsx)"""
+    if params['format'] != 'xlsx':
+        return ''
+    return params.get('split') or ''
+
+
+def export_filename(params):
+    extension = EXPORT_FORMATS[params['format']][0]
+    start = f'{MONTH_NAMES[params["month"] - 1]}_{params["year"]}'
+    if not is_range(params):
+        return f'Пацієнти_{start}{extension}'
+    if params['year'] == params['end_year'] and (params['month'], params['end_month']) == (1, 12):
+        return f'Пацієнти_{params["year"]}{extension}'
+    return f'Пацієнти_{start}-{MONTH_NAMES[params["end_month"] - 1]}_{params["end_year"]}{extension}'
+
+
+def build_export_query(params):
+    """
+    Запит колонок EXPORT_COLUMNS для експорту за параметрами форми:
+    активні пацієнти разом з архівом (UNION ALL). Порядок - як у списку,
+    а для книги з аркушами - за групою (місяць або відділення) і за датою
+    поступлення, щоб кожен аркуш заповнювався підряд за один прохід
+    """
+    start, end = export_period(params)
+    selects = []
+    for model in (Patient, ArchivedPatient):
+        select = db.select(*(getattr(model, name) for name in FIELD_NAMES), model.id)
+        select = select.filter(model.admission_date >= start, model.admission_date < end)
+        selects.append(filter_patients(
+            select,
+            department=params.get('department') or '',
+            doctor=params.get('doctor') or '',
+            status='' if params.get('include_deceased', True) else 'alive',
+            model=model
+        ))
+    union = db.union_all(*selects).subquery()
+    query = read_query(*(union.c[name] for name in FIELD_NAMES))
+    split = export_split(params)
+    if split == 'month':
+        return query.order_by(union.c.admission_date, union.c.id)
+    if split == 'department':
+        return query.order_by(union.c.department, union.c.admission_date, union.c.id)
+    return query.order_by(union.c.admission_date.desc(), union.c.id.desc())
+
+
+def has_census_sheet(params):
+    """Аркуш зайнятості ліжок додається лише до Excel за один місяць"""
+    return params['format'] == 'xlsx' and not is_range(params)
+
+
+def export_extra_sheets(params):
+    """Додаткові аркуші Excel-експорту: щоденна зайнятість ліжок за місяць"""
+    from app.census import census_sheet
+
+    if not has_census_sheet(params):
+        return ()
+    return [census_sheet(params['year'], params['month'],
+                         department=params.get('department') or '',
+                         doctor=params.get('doctor') or '')]
+
+
+def export_cache_key(params):
+    """
+    Ключ готового результату: параметри експорту плюс відбиток даних періоду,
+    тож після будь-якої зміни пацієнтів періоду файл створюється заново.
+    З аркушем зайнятості до ключа входять і всі перебування, що перетинають
+    місяць, зокрема пацієнтів, що поступили раніше
+    """
+    from app.census import stays_fingerprint
+
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    period = export_period(params)
+    key = f'export:{digest}:{period_fingerprint(*period)}'
+    if has_census_sheet(params):
+        key += ':' + stays_fingerprint(*period)
+    return key
+
+
+def run_export_job(job_id, params, progress):
+    """Фонове завдання експорту (див. app.jobs)"""
+    from app import jobs
+
+    query = build_export_query(params)
+    progress.set_total(query.order_by(None).count())
+    path = jobs.result_path(job_id, EXPORT_FORMATS[params['format']][0])
+    count = write_export(params['format'], query, path, track=progress.track,
+                         extra_sheets=export_extra_sheets(params), split=export_split(params))
+    return {
+        'result_path': path,
+        'filename': export_filename(params),
+        'result': {'count': count},
+    }
+
+
+def temporary_export_path(suffix):
+    """Шлях до тимчасового файлу експорту (видаляє викликач)"""
+    handle, path = tempfile.mkstemp(prefix='export_', suffix=suffix)
+    os.close(handle)
+    return path
+
+
+def stream_file(path, chunk_size=64 * 1024):
+    """Читає файл частинами і видаляє його, коли відповідь закрито"""
+    try:
+        with open(path, 'rb') as fileobj:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def attachment_response(chunks, mimetype, filename):
+    """Відповідь-завантаження з ітератора частин файлу"""
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
+def download_response(path, mimetype, filename):
+    """Відповідь-завантаження тимчасового файлу експорту"""
+    response = attachment_response(stream_file(path), mimetype, filename)
+    response.headers['Content-Length'] = str(os.path.getsize(path))
+    return response
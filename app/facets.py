@@ -0,0 +1,31 @@
+"""
+Значення для фільтрів списку пацієнтів (відділення, лікарі) з кількістю
+пацієнтів за місяць. Результат кешується за версією місяця, тому
+після змін пацієнтів цього місяця список перераховується.
+"""
+from flask import current_app
+from app import db, cache
+from app.events import month_key
+from app.models import Patient
+from app.queries import filter_by_month
+from app.sqlite import read_query
+
+
+def _counts(column, year, month):
+    query = read_query(column, db.func.count(Patient.id))
+    query = filter_by_month(query, year, month)
+    rows = query.group_by(column).order_by(column).all()
+    return [(value, count) for value, count in rows]
+
+
+def month_facets(year, month):
+    """Повертає {'departments': [(назва, кількість)], 'doctors': [...]}"""
+    key = f'facets:{year}-{month:02d}:{cache.version(month_key(year, month))}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = {
+            'departments': _counts(Patient.department, year, month),
+            'doctors': _counts(Patient.doctor, year, month),
+        }
+        cache.set(key, facets, timeout=current_app.config['FACETS_CACHE_TIMEOUT'])
+    return facets
@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, DateField, TextAreaField, SelectField, BooleanField, SubmitField
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, DateField, TextAreaField, SelectField, BooleanField, SubmitField, IntegerField
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Length, ValidationError, Optional
 from datetime import datetime
-from app.models import User, Patient
+from app.models import User, Patient, ArchivedPatient
 
 class LoginForm(FlaskForm):
     username = StringField('Ім\'я користувача', validators=[DataRequired(), Length(min=3, max=80)])
@@ -36,6 +38,9 @@ class PatientForm(FlaskForm):
     history_number = StringField('№ Історії', validators=[DataRequired(), Length(max=50)])
     comment = TextAreaField('Коментар')
     is_deceased = BooleanField('Пацієнт помер')
+    death_date = DateField('Дата смерті', validators=[Optional()], format='%Y-%m-%d')
+    # Версія запису, яку бачив користувач (Patient.version_id); лише для редагування
+    version_id = IntegerField(widget=HiddenInput(), validators=[Optional()])
     submit = SubmitField('Зберегти')
     
     def __init__(self, original_history_number=None, *args, **kwargs):
@@ -47,31 +52,78 @@ class PatientForm(FlaskForm):
             patient = Patient.query.filter_by(history_number=history_number.data).first()
             if patient:
                 raise ValidationError('Цей номер історії вже використовується.')
+            archived = ArchivedPatient.query.filter_by(history_number=history_number.data).first()
+            if archived:
+                raise ValidationError('Цей номер історії вже використовується (пацієнт в архіві).')
+
+
+MONTH_CHOICES = [
+    ('01', 'Січень'), ('02', 'Лютий'), ('03', 'Березень'),
+    ('04', 'Квітень'), ('05', 'Травень'), ('06', 'Червень'),
+    ('07', 'Липень'), ('08', 'Серпень'), ('09', 'Вересень'),
+    ('10', 'Жовтень'), ('11', 'Листопад'), ('12', 'Грудень')
+]
+
+
+# Вибір року і значення за замовчуванням - функції, що викликаються під час
+# створення форми: у воркері, який працює з минулого року, перелік актуальний
+def year_choices():
+    """Поточний рік і два попередні"""
+    year = datetime.now().year
+    return [(str(value), str(value)) for value in range(year - 2, year + 1)]
+
+
+def current_month():
+    return f'{datetime.now().month:02d}'
+
+
+def current_year():
+    return str(datetime.now().year)
 
 
 class ExportForm(FlaskForm):
     """Форма для експорту даних пацієнтів"""
     
+    period = SelectField(
+        'Період',
+        choices=[('month', 'Один місяць'), ('range', 'Кілька місяців (з ... по ...)')],
+        default='month'
+    )
+    
     month = SelectField(
         'Місяць', 
-        choices=[
-            ('01', 'Січень'), ('02', 'Лютий'), ('03', 'Березень'),
-            ('04', 'Квітень'), ('05', 'Травень'), ('06', 'Червень'),
-            ('07', 'Липень'), ('08', 'Серпень'), ('09', 'Вересень'),
-            ('10', 'Жовтень'), ('11', 'Листопад'), ('12', 'Грудень')
-        ],
+        choices=MONTH_CHOICES,
         validators=[DataRequired()],
-        default=str(datetime.now().month).zfill(2)
+        default=current_month
     )
     
     year = SelectField(
         'Рік',
+        choices=year_choices,
+        validators=[DataRequired()],
+        default=current_year
+    )
+    
+    end_month = SelectField(
+        'По місяць',
+        choices=MONTH_CHOICES,
+        default='12'
+    )
+    
+    end_year = SelectField(
+        'По рік',
+        choices=year_choices,
+        default=current_year
+    )
+    
+    split = SelectField(
+        'Аркуші Excel',
         choices=[
-            (str(year), str(year)) 
-            for year in range(datetime.now().year - 2, datetime.now().year + 1)
+            ('', 'Один аркуш'),
+            ('month', 'Аркуш на кожен місяць + підсумок'),
+            ('department', 'Аркуш на кожне відділення + підсумок')
         ],
-        validators=[DataRequired()],
-        default=str(datetime.now().year)
+        default=''
     )
     
     department = StringField(
@@ -89,4 +141,33 @@ class ExportForm(FlaskForm):
         default=True
     )
     
-    submit = SubmitField('Експортувати в Excel')
\ No newline at end of file
+    file_format = SelectField(
+        'Формат файлу',
+        choices=[
+            ('xlsx', 'Excel (.xlsx)'),
+            ('csv', 'CSV (.csv)'),
+            ('parquet', 'Parquet (.parquet)'),
+            ('ndjson', 'JSON Lines (.ndjson)')
+        ],
+        validators=[DataRequired()],
+        default='xlsx'
+    )
+    
+    submit = SubmitField('Експортувати')
+    
+    def validate_end_month(self, end_month):
+        if self.period.data != 'range':
+            return
+        if (self.end_year.data, end_month.data) < (self.year.data, self.month.data):
+            raise ValidationError('Кінець періоду раніше за його початок.')
+
+class ImportForm(FlaskForm):
+    """Форма завантаження Excel-файлу з пацієнтами"""
+    
+    file = FileField(
+        'Excel файл',
+        validators=[FileRequired('Оберіть файл для імпорту.'),
+                    FileAllowed(['xlsx', 'xls'], 'Підтримуються лише файли Excel (.xlsx, .xls).')]
+    )
+    
+    submit = SubmitField('Перевірити файл')
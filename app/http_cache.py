@@ -0,0 +1,60 @@
+"""
+Кеш відрендерених сторінок і умовні GET-запити.
+
+Готовий HTML зберігається в кеші застосунку за ключем з версії набору
+даних (cache.version, її збільшує events.patients_changed після кожного
+запису) і параметрів сторінки. ETag рахується з того самого ключа, тож
+повторне оновлення сторінки з If-None-Match отримує 304 ще до звернення
+до кешу чи бази. Кеш браузера лише приватний і щоразу перепитує сервер
+(no-cache), тому після зміни даних користувач одразу бачить нову версію.
+
+Якщо в сесії чекають flash-повідомлення, сторінка рендериться без кешу:
+повідомлення показуються один раз і не мають потрапити в збережену копію.
+
+Кешування і 304 працюють лише зі спільним кешем (CACHE_TYPE=redis) або
+коли сервер має один процес (WEB_PROCESSES=1). Кеш у пам'яті інших
+воркерів не дізнається про bump версії, і вони віддавали б старий список.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from flask import current_app, request, session, make_response
+from app import cache
+
+
+def page_cache_enabled():
+    """Версії даних однакові для всіх процесів, що обслуговують запити"""
+    return cache.shared or current_app.config['WEB_PROCESSES'] <= 1
+
+
+def cached_page(name, version, parts, render, timeout):
+    """
+    Відповідь з HTML сторінки name. version - назва версії даних у кеші,
+    parts - усе, від чого залежить вміст (користувач, параметри запиту),
+    render - функція, що повертає HTML.
+    """
+    if session.get('_flashes') or not page_cache_enabled():
+        return render()
+
+    payload = json.dumps([cache.version(version), parts], sort_keys=True, ensure_ascii=False, default=str)
+    etag = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    key = f'page:{name}:{etag}'
+    entry = cache.get(key)
+    rendered = entry is None
+    if rendered:
+        entry = (render(), datetime.now(timezone.utc).replace(microsecond=0))
+        cache.set(key, entry, timeout=timeout)
+    html, last_modified = entry
+
+    response = make_response(html)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    if rendered:
+        # Нова копія може відрізнятися від тієї, що в браузері, навіть з тим
+        # самим ETag (версію не збільшили) - завжди повний вміст
+        return response
+    # If-None-Match або If-Modified-Since для збереженої копії - 304
+    return response.make_conditional(request)
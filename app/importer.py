@@ -0,0 +1,280 @@
+"""
+Масовий імпорт пацієнтів з Excel.
+
+Файл обробляється цілими колонками в pandas (очищення рядків, розбір
+дат), дублікати шукаються одним запитом на порцію номерів історій, а
+записи вставляються порціями через executemany з
+INSERT ... ON CONFLICT DO NOTHING. Замість повідомлень на кожен рядок
+повертається ImportResult зі структурованим звітом.
+
+Використовується з командного рядка (import_data.py) і з веб-імпорту
+(app/routes/imports.py), де перевірка і запис виконуються фоновими
+завданнями. pandas імпортується під час першого імпорту, а не під час
+старту воркера.
+"""
+import os
+from datetime import datetime
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.events import patients_changed
+from app.changes import record_changes
+
+# Колонка у файлі -> поле Patient
+COLUMNS = {
+    'ПІБ': 'full_name',
+    '№ Історії': 'history_number',
+    'ВІДДІЛЕННЯ': 'department',
+    'ЛІКАР': 'doctor',
+    'Коментар': 'comment',
+    'ДАТА': 'discharge_date',
+}
+REQUIRED_COLUMNS = ['ПІБ', '№ Історії']
+TEXT_COLUMNS = ['ПІБ', '№ Історії', 'ВІДДІЛЕННЯ', 'ЛІКАР', 'Коментар']
+DATE_FORMATS = ['%d.%m.%Y', '%Y-%m-%d']
+NOT_SPECIFIED = 'Не вказано'
+
+
+class ImportResult:
+    """Звіт імпорту: лічильники та список пропущених рядків з причинами"""
+
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.issues = []
+        self.months = set()
+
+    def add_issue(self, rows, kind, reason, history_numbers=None):
+        """kind: 'skipped' (рядок не імпортовано) або 'warning' (імпортовано з зауваженням)"""
+        history_numbers = history_numbers if history_numbers is not None else [None] * len(rows)
+        for row, number in zip(rows, history_numbers):
+            self.issues.append({'row': int(row), 'history_number': number,
+                                'kind': kind, 'reason': reason})
+
+    @property
+    def skipped(self):
+        return sum(1 for issue in self.issues if issue['kind'] == 'skipped')
+
+    @property
+    def warnings(self):
+        return sum(1 for issue in self.issues if issue['kind'] == 'warning')
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'warnings': self.warnings,
+            'issues': sorted(self.issues, key=lambda issue: issue['row']),
+        }
+
+
+def read_patients_file(path):
+    """Читає Excel-файл; текстові колонки читаються як рядки (без '123.0')"""
+    import pandas as pd
+
+    df = pd.read_excel(path, dtype={column: str for column in TEXT_COLUMNS})
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def parse_dates(series):
+    """Розбір дат цілою колонкою: дати Excel, 'дд.мм.рррр' або 'рррр-мм-дд'"""
+    import pandas as pd
+
+    parsed = pd.to_datetime(series, format=DATE_FORMATS[0], errors='coerce')
+    for date_format in DATE_FORMATS[1:]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(series[missing], format=date_format, errors='coerce')
+    return parsed
+
+
+def prepare_rows(df, result):
+    """
+    Векторне очищення даних файлу. Повертає DataFrame з полями Patient
+    та колонкою row (номер рядка у файлі) лише для придатних рядків.
+    """
+    import pandas as pd
+
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing_columns:
+        raise ValueError(f'У файлі немає обов\'язкових колонок: {", ".join(missing_columns)}')
+
+    result.total = len(df)
+    data = pd.DataFrame({'row': df.index + 2})
+    for column, field in COLUMNS.items():
+        if field == 'discharge_date':
+            continue
+        if column in df.columns:
+            values = df[column].str.strip()
+            data[field] = values.mask(values == '')
+        else:
+            data[field] = None
+
+    # Обов'язкові поля
+    incomplete = data['full_name'].isna() | data['history_number'].isna()
+    result.add_issue(data.loc[incomplete, 'row'], 'skipped', 'Відсутні ПІБ або № Історії')
+    data = data[~incomplete]
+
+    # Дублікати всередині файлу: залишаємо перше входження
+    repeated = data['history_number'].duplicated(keep='first')
+    result.add_issue(data.loc[repeated, 'row'], 'skipped', 'Повтор № Історії у файлі',
+                     data.loc[repeated, 'history_number'].tolist())
+    data = data[~repeated]
+
+    data['department'] = data['department'].fillna(NOT_SPECIFIED)
+    data['doctor'] = data['doctor'].fillna(NOT_SPECIFIED)
+    data['comment'] = data['comment'].astype(object).where(data['comment'].notna(), None)
+
+    # Дата виписки; якщо її немає, датою поступлення стає сьогоднішня
+    if 'ДАТА' in df.columns:
+        raw_dates = df.loc[data.index, 'ДАТА']
+        dates = parse_dates(raw_dates)
+        invalid = dates.isna() & raw_dates.notna()
+        result.add_issue(data.loc[invalid, 'row'], 'warning', 'Неправильний формат дати',
+                         data.loc[invalid, 'history_number'].tolist())
+        data['discharge_date'] = dates.dt.date.astype(object).where(dates.notna(), None)
+    else:
+        data['discharge_date'] = None
+    today = datetime.now().date()
+    data['admission_date'] = data['discharge_date'].where(data['discharge_date'].notna(), today)
+
+    return data
+
+
+def existing_history_numbers(numbers, chunk_size=900):
+    """Номери історій, що вже є в базі або в архіві (запит на порцію номерів)"""
+    numbers = list(numbers)
+    existing = set()
+    for model in (Patient, ArchivedPatient):
+        for start in range(0, len(numbers), chunk_size):
+            chunk = numbers[start:start + chunk_size]
+            rows = db.session.query(model.history_number).filter(
+                model.history_number.in_(chunk)
+            ).all()
+            existing.update(row[0] for row in rows)
+    return existing
+
+
+def insert_statement():
+    """INSERT, що пропускає конфлікти за номером історії (SQLite та PostgreSQL)"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return db.insert(Patient.__table__)
+    return insert(Patient.__table__).on_conflict_do_nothing(index_elements=['history_number'])
+
+
+def validate_patients(df, result):
+    """
+    Перевірка файлу без запису в базу: очищення даних і пошук номерів
+    історій, що вже є в базі. Повертає DataFrame придатних рядків.
+    """
+    data = prepare_rows(df, result)
+
+    # Одна перевірка наявних номерів замість запиту на кожен рядок
+    existing = existing_history_numbers(data['history_number'])
+    duplicate = data['history_number'].isin(existing)
+    result.add_issue(data.loc[duplicate, 'row'], 'skipped', '№ Історії вже існує',
+                     data.loc[duplicate, 'history_number'].tolist())
+    return data[~duplicate]
+
+
+def _record_months(months, records):
+    for record in records:
+        for column in ('admission_date', 'discharge_date'):
+            value = record[column]
+            if value is not None:
+                months.add((value.year, value.month))
+
+
+def import_patients(df, user_id, chunk_size=5000, commit_chunks=False, progress=None):
+    """
+    Імпортує пацієнтів з DataFrame (див. read_patients_file). Повертає ImportResult.
+
+    За замовчуванням весь файл записується однією транзакцією. З
+    commit_chunks=True кожна порція фіксується окремо, тож блокування
+    запису тримається недовго і список пацієнтів лишається доступним
+    під час великого імпорту; при помилці зберігаються вже записані порції.
+    progress - необов'язковий JobProgress фонового завдання.
+    """
+    result = ImportResult()
+    data = validate_patients(df, result)
+
+    fields = ['admission_date', 'discharge_date', 'full_name', 'department',
+              'doctor', 'history_number', 'comment']
+    records = data[fields].to_dict('records')
+    if progress is not None:
+        progress.set_total(len(records))
+    statement = insert_statement()
+    pending_months = set()
+    try:
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            for record in chunk:
+                record['is_deceased'] = False
+                record['created_by'] = user_id
+            # RETURNING повертає лише вставлені рядки (конфлікти пропущено) -
+            # їх id потрібні для журналу змін
+            ids = dict(db.session.execute(statement.returning(Patient.history_number, Patient.id), chunk).all())
+            result.inserted += len(ids)
+            record_changes('create', [dict(record, id=ids[record['history_number']])
+                                      for record in chunk if record['history_number'] in ids], user_id)
+            _record_months(pending_months, chunk)
+            if commit_chunks:
+                db.session.commit()
+                patients_changed(pending_months)
+                result.months |= pending_months
+                pending_months = set()
+            if progress is not None:
+                progress.advance(len(chunk))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if not commit_chunks:
+        result.months |= pending_months
+        patients_changed(result.months)
+    return result
+
+
+def run_import_check_job(job_id, params, progress):
+    """Фонове завдання перевірки завантаженого файлу (див. app.jobs)"""
+    from flask import current_app
+
+    try:
+        result = ImportResult()
+        data = validate_patients(read_patients_file(params['path']), result)
+    except Exception:
+        os.remove(params['path'])
+        raise
+
+    report = result.to_dict()
+    limit = current_app.config['IMPORT_PREVIEW_LIMIT']
+    report['valid'] = len(data)
+    report['issues_total'] = len(report['issues'])
+    report['issues'] = report['issues'][:limit]
+    # Файл зберігається разом із завданням і видаляється після терміну зберігання
+    return {'result_path': params['path'], 'filename': params['filename'], 'result': report}
+
+
+def run_import_job(job_id, params, progress):
+    """Фонове завдання запису перевіреного файлу порціями (див. app.jobs)"""
+    from flask import current_app
+
+    result = import_patients(
+        read_patients_file(params['path']), params['user_id'],
+        chunk_size=current_app.config['IMPORT_CHUNK_SIZE'],
+        commit_chunks=True, progress=progress
+    )
+    os.remove(params['path'])
+
+    report = result.to_dict()
+    report['issues_total'] = len(report['issues'])
+    report['issues'] = report['issues'][:current_app.config['IMPORT_PREVIEW_LIMIT']]
+    return {'filename': params['filename'], 'result': report}
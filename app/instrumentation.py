@@ -0,0 +1,148 @@
+"""
+Вимірювання запитів (вмикається INSTRUMENTATION=1).
+
+Для кожного HTTP-запиту рахуються:
+- кількість SQL-запитів і їхній сумарний час (події SQLAlchemy на всіх
+  двигунах, зокрема двигуні тільки для читання);
+- час рендерингу шаблонів (сигнали Flask);
+- розмір відповіді.
+
+Результат додається до відповіді заголовком Server-Timing (видно у
+вкладці Network браузера) і пишеться рядком JSON у INSTRUMENTATION_LOG
+(logs/ змонтовано як том у docker-compose).
+
+Однаковий SELECT, виконаний у запиті N_PLUS_ONE_THRESHOLD разів і
+більше, - ознака N+1 (наприклад, ліниве завантаження Patient.creator у
+циклі шаблону): такі запити потрапляють у поле n_plus_one і в журнал
+застосунку як попередження.
+"""
+import json
+import logging
+import os
+import time
+from collections import Counter
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """Лічильники одного HTTP-запиту (зберігаються в g)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.statements = Counter()
+        self._render_started = []
+
+    def n_plus_one(self, threshold):
+        return [
+            {'statement': statement, 'count': count}
+            for statement, count in self.statements.most_common()
+            if count >= threshold and statement.lstrip().upper().startswith('SELECT')
+        ]
+
+
+def _metrics():
+    if has_request_context():
+        return g.get('request_metrics')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _metrics() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _metrics()
+    if metrics is None or not conn.info.get('query_started'):
+        return
+    metrics.sql_time += time.perf_counter() - conn.info['query_started'].pop()
+    metrics.sql_count += 1
+    # Текст з плейсхолдерами однаковий для всіх ітерацій N+1
+    metrics.statements[statement] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    metrics = _metrics()
+    if metrics is not None:
+        metrics._render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    metrics = _metrics()
+    if metrics is not None and metrics._render_started:
+        metrics.render_time += time.perf_counter() - metrics._render_started.pop()
+
+
+class Instrumentation:
+    """Налаштовується з конфігурації в create_app; без INSTRUMENTATION нічого не робить"""
+
+    def __init__(self):
+        self.enabled = False
+
+    def init_app(self, app):
+        self.enabled = app.config['INSTRUMENTATION']
+        if not self.enabled:
+            return
+        self.threshold = app.config['N_PLUS_ONE_THRESHOLD']
+        self.log = self._file_logger(app.config['INSTRUMENTATION_LOG'])
+
+        # Події на класі Engine - для всіх двигунів застосунку
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _file_logger(self, path):
+        log = logging.getLogger('hospital.requests')
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        if not log.handlers:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.FileHandler(path, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(handler)
+        return log
+
+    def _start(self):
+        g.request_metrics = RequestMetrics()
+
+    def _finish(self, response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        total = (time.perf_counter() - metrics.started) * 1000
+        sql_ms = metrics.sql_time * 1000
+        render_ms = metrics.render_time * 1000
+        response.headers.add('Server-Timing', f'db;dur={sql_ms:.1f};desc="{metrics.sql_count} SQL"')
+        response.headers.add('Server-Timing', f'render;dur={render_ms:.1f}')
+        response.headers.add('Server-Timing', f'app;dur={total:.1f}')
+
+        suspects = metrics.n_plus_one(self.threshold)
+        for item in suspects:
+            logger.warning('Можливий N+1 у %s %s: %d однакових запитів: %s',
+                           request.method, request.path, item['count'], item['statement'][:200])
+        self.log.info(json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total, 1),
+            'sql_count': metrics.sql_count,
+            'sql_ms': round(sql_ms, 1),
+            'render_ms': round(render_ms, 1),
+            # Потокові відповіді (експорт) не мають відомого розміру
+            'size': None if response.is_streamed else response.calculate_content_length(),
+            'n_plus_one': suspects,
+        }, ensure_ascii=False))
+        return response
@@ -0,0 +1,273 @@
+"""
+Фонові завдання (експорт, імпорт) з відстеженням прогресу.
+
+Завдання виконуються у пулі потоків поточного процесу, а їхній стан
+зберігається в окремій локальній базі SQLite (JOBS_DATABASE), тому
+сторінку статусу може обслужити будь-який воркер. Файли результатів
+лежать у JOBS_STORAGE_DIR і видаляються після закінчення терміну
+зберігання (JOBS_RESULT_TTL).
+
+Кожен процес, що ставить завдання, має власний випадковий токен і раз на
+HEARTBEAT_INTERVAL секунд оновлює heartbeat_at своїх активних завдань.
+PID для цього не годиться: у контейнері після перезапуску воркери
+отримують ті самі номери. Активне завдання без свіжого heartbeat або
+старше за JOBS_MAX_RUNTIME вважається перерваним.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    cache_key TEXT,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    result_path TEXT,
+    filename TEXT,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    created_by INTEGER,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_cache_key ON jobs (cache_key, status);
+"""
+
+# Колонки, яких немає в базах завдань, створених попередніми версіями
+COLUMNS = {'owner': 'TEXT', 'heartbeat_at': 'REAL'}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+HEARTBEAT_INTERVAL = 10
+# Скільки пропущених heartbeat означають, що процес-власник зник
+HEARTBEAT_TIMEOUT = 6 * HEARTBEAT_INTERVAL
+
+INTERRUPTED = 'Завдання перервано: сервер перезапущено або перевищено час виконання.'
+
+
+class JobProgress:
+    """Передається у функцію завдання для звітування про прогрес"""
+
+    def __init__(self, queue, job_id, every=1000):
+        self.queue = queue
+        self.job_id = job_id
+        self.every = every
+        self.count = 0
+
+    def set_total(self, total):
+        self.queue.update(self.job_id, total=total)
+
+    def advance(self, step=1):
+        self.count += step
+        if self.count % self.every < step:
+            self.queue.update(self.job_id, progress=self.count)
+
+    def track(self, items):
+        """Пропускає елементи ітератора, рахуючи їх"""
+        for item in items:
+            yield item
+            self.advance()
+
+
+class JobQueue:
+    """Черга фонових завдань, налаштовується з конфігурації в create_app"""
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.token = None
+        self._token_pid = None
+        self._heartbeat_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.db_path = app.config['JOBS_DATABASE']
+        self.storage_dir = app.config['JOBS_STORAGE_DIR']
+        self.result_ttl = app.config['JOBS_RESULT_TTL']
+        self.max_runtime = app.config['JOBS_MAX_RUNTIME']
+        self.executor = ThreadPoolExecutor(max_workers=app.config['JOBS_MAX_WORKERS'],
+                                           thread_name_prefix='job')
+        self.token, self._token_pid = uuid.uuid4().hex, os.getpid()
+        os.makedirs(self.storage_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            for name, column_type in COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE jobs ADD COLUMN {name} {column_type}')
+
+    def _start_heartbeat(self):
+        """
+        Потік heartbeat запускається з першим завданням процесу. Після fork
+        (gunicorn --preload) потоки не успадковуються, тож дочірній процес
+        отримує новий токен і власний потік.
+        """
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            if self._token_pid != os.getpid():
+                self.token, self._token_pid = uuid.uuid4().hex, os.getpid()
+            threading.Thread(target=self._beat, args=(self.token,),
+                             name='job-heartbeat', daemon=True).start()
+            self._heartbeat_pid = os.getpid()
+
+    def _beat(self, token):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                        (time.time(), token)
+                    )
+            except sqlite3.Error:
+                self.app.logger.exception('Не вдалося оновити heartbeat фонових завдань')
+
+    def _interrupted(self, job, now):
+        """Активне завдання, процес якого зник або яке виконується задовго"""
+        last_seen = job['heartbeat_at'] or job['created_at']
+        return job['status'] in ACTIVE_STATUSES and (
+            last_seen < now - HEARTBEAT_TIMEOUT or job['created_at'] < now - self.max_runtime
+        )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def result_path(self, job_id, extension):
+        return os.path.join(self.storage_dir, job_id + extension)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        # Процес, що виконував завдання, завершився (перезапуск воркера)
+        now = time.time()
+        if self._interrupted(job, now):
+            fields = {'status': 'failed', 'error': INTERRUPTED,
+                      'finished_at': now, 'expires_at': now + self.result_ttl}
+            self.update(job_id, **fields)
+            job.update(fields)
+        return job
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def find_cached(self, cache_key):
+        """Готове і ще не застаріле завдання з таким самим ключем результату"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, result_path FROM jobs WHERE cache_key = ? AND status = 'done' "
+                "AND expires_at > ? ORDER BY finished_at DESC LIMIT 1",
+                (cache_key, time.time())
+            ).fetchone()
+        # Завдання без файлу результату (імпорт) вважаються готовими і так
+        if row and (not row['result_path'] or os.path.exists(row['result_path'])):
+            return row['id']
+        return None
+
+    def find_active(self, cache_key):
+        """Завдання з таким самим ключем, що ще виконується"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE cache_key = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at DESC LIMIT 1",
+                (cache_key,)
+            ).fetchone()
+        if row and self.get(row['id'])['status'] in ACTIVE_STATUSES:
+            return row['id']
+        return None
+
+    def submit(self, kind, params, func, cache_key=None, user_id=None):
+        """
+        Ставить завдання в чергу і повертає його id.
+        func(job_id, params, progress) виконується в контексті застосунку
+        і повертає словник з полями для збереження (result_path, filename, result).
+        Якщо для cache_key вже є готовий або активний результат, повертається він.
+        """
+        self.cleanup()
+        if cache_key:
+            existing = self.find_cached(cache_key) or self.find_active(cache_key)
+            if existing:
+                return existing
+
+        self._start_heartbeat()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            now = time.time()
+            conn.execute(
+                'INSERT INTO jobs (id, kind, params, cache_key, status, owner, heartbeat_at, '
+                "created_by, created_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), cache_key,
+                 self.token, now, user_id, now)
+            )
+        self.executor.submit(self._run, job_id, params, func)
+        return job_id
+
+    def _run(self, job_id, params, func):
+        from app import db
+
+        with self.app.app_context():
+            self.update(job_id, status='running')
+            progress = JobProgress(self, job_id)
+            try:
+                fields = func(job_id, params, progress) or {}
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Фонове завдання %s завершилось помилкою', job_id)
+                now = time.time()
+                self.update(job_id, status='failed', error=str(e),
+                            finished_at=now, expires_at=now + self.result_ttl)
+            else:
+                now = time.time()
+                self.update(job_id, status='done', progress=progress.count,
+                            finished_at=now, expires_at=now + self.result_ttl, **fields)
+            finally:
+                db.session.remove()
+
+    def cleanup(self):
+        """Позначає перервані завдання, видаляє застарілі завдання та їхні файли"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, expires_at = ? "
+                "WHERE status IN ('queued', 'running') "
+                'AND (COALESCE(heartbeat_at, created_at) < ? OR created_at < ?)',
+                (INTERRUPTED, now, now + self.result_ttl, now - HEARTBEAT_TIMEOUT, now - self.max_runtime)
+            )
+            rows = conn.execute(
+                'SELECT id, result_path FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?',
+                (now,)
+            ).fetchall()
+            for row in rows:
+                if row['result_path'] and os.path.exists(row['result_path']):
+                    os.remove(row['result_path'])
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in rows])
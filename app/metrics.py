@@ -0,0 +1,107 @@
+"""
+Метрики пулу з'єднань з базою.
+
+MeteredQueuePool - звичайний QueuePool, що рахує видачі з'єднань і час
+очікування вільного з'єднання. Якщо очікування довше за
+slow_checkout_ms, у лог пишеться рядок зі станом пулу. Поточні
+значення віддає /admin/metrics (pool_metrics).
+"""
+import logging
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Лічильники пулу; спільні для пулу і його копій після dispose()"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record(self, elapsed, waited):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_time += elapsed
+            if waited:
+                self.waits += 1
+            if elapsed > self.max_wait:
+                self.max_wait = elapsed
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_ms_total': round(self.wait_time * 1000, 1),
+                'wait_ms_avg': round(self.wait_time * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_ms_max': round(self.max_wait * 1000, 1),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool з лічильниками очікування з'єднань"""
+
+    # Поріг попередження в лог; задається з POOL_SLOW_CHECKOUT_MS (configure_pool)
+    slow_checkout_ms = 100
+
+    def __init__(self, creator, **kwargs):
+        super().__init__(creator, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        # Якщо всі з'єднання зайняті і ліміт переповнення вичерпано,
+        # _do_get блокується, доки з'єднання не повернуть
+        waited = self.checkedout() >= self.size() + self._max_overflow
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            logger.warning('Пул з\'єднань: не дочекалися з\'єднання (%s)', self.status())
+            raise
+        elapsed = time.perf_counter() - started
+        self.stats.record(elapsed, waited)
+        if elapsed * 1000 >= self.slow_checkout_ms:
+            logger.warning('Пул з\'єднань: очікування %.0f мс (%s; %s)',
+                           elapsed * 1000, self.status(), self.stats.as_dict())
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.slow_checkout_ms = self.slow_checkout_ms
+        pool.stats = self.stats
+        return pool
+
+
+def configure_pool(engine, config):
+    if isinstance(engine.pool, MeteredQueuePool):
+        engine.pool.slow_checkout_ms = config['POOL_SLOW_CHECKOUT_MS']
+
+
+def pool_metrics(engine):
+    """Стан пулу двигуна: розмір, зайняті з'єднання, лічильники очікування"""
+    pool = engine.pool
+    metrics = {'class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    if isinstance(pool, MeteredQueuePool):
+        metrics.update(pool.stats.as_dict())
+    return metrics
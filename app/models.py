@@ -28,6 +28,22 @@ class User(UserMixin, db.Model):
 
 class Patient(db.Model):
     __tablename__ = 'patients'
+    __table_args__ = (
+        # Складений індекс під фільтри списку та експорту: діапазон місяця
+        # по admission_date, далі відділення, лікар і статус
+        db.Index('ix_patients_admission_filters',
+                 'admission_date', 'department', 'doctor', 'is_deceased'),
+        # Порядок списку та ключ keyset-пагінації: (admission_date desc, id desc)
+        db.Index('ix_patients_admission_date_id', 'admission_date', 'id'),
+        # Виписки та смерті за місяць (статистика, app/stats.py)
+        # Друга колонка - для зайнятості ліжок (app/census.py): перебування,
+        # що перетинають період, відбираються без читання таблиці
+        db.Index('ix_patients_discharge_admission', 'discharge_date', 'admission_date'),
+        db.Index('ix_patients_death_date', 'death_date'),
+        # SQLite без AUTOINCREMENT видає новому рядку max(id) + 1 і повторно
+        # використовує id пацієнтів, перенесених в архів (app/archive.py)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     admission_date = db.Column(db.Date, nullable=False)
@@ -43,6 +59,94 @@ class Patient(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Версія рядка для оптимістичного блокування: UPDATE виконується з
+    # WHERE version_id = <прочитана версія>, тож паралельна зміна не
+    # перезаписується мовчки (StaleDataError замість втрати даних)
+    version_id = db.Column(db.Integer, nullable=False, server_default=db.text('1'))
+    
+    __mapper_args__ = {'version_id_col': version_id}
+    
+    def __repr__(self):
+        return f'<Patient {self.full_name} - {self.history_number}>'
+
+
+
+class ArchivedPatient(db.Model):
+    """
+    Пацієнти, виписані давніше за ARCHIVE_AFTER_MONTHS (app/archive.py).
+    Колонки ті самі, що в Patient, id зберігається, тож пацієнта можна
+    повернути до активної таблиці без змін.
+    """
+    __tablename__ = 'patients_archive'
+    __table_args__ = (
+        # Експорт за місяць поступлення (у порядку списку)
+        db.Index('ix_patients_archive_admission_date_id', 'admission_date', 'id'),
+        # Статистика та зайнятість ліжок за датами виписки і смерті
+        db.Index('ix_patients_archive_discharge_admission', 'discharge_date', 'admission_date'),
+        db.Index('ix_patients_archive_death_date', 'death_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    admission_date = db.Column(db.Date, nullable=False)
+    discharge_date = db.Column(db.Date, nullable=True)
+    full_name = db.Column(db.String(200), nullable=False)
+    department = db.Column(db.String(100), nullable=False)
+    doctor = db.Column(db.String(200), nullable=False)
+    history_number = db.Column(db.String(50), unique=True, nullable=False)
+    comment = db.Column(db.Text, nullable=True)
+    is_deceased = db.Column(db.Boolean, default=False)
+    death_date = db.Column(db.Date, nullable=True)
+    
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    version_id = db.Column(db.Integer, nullable=False, server_default=db.text('1'))
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivedPatient {self.full_name} - {self.history_number}>'
+
+
+class MonthlyStat(db.Model):
+    """
+    Агрегати за місяць для відділення та лікаря. Рядки місяця
+    перераховуються після кожної зміни його пацієнтів (app/stats.py).
+    """
+    __tablename__ = 'monthly_stats'
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'department', 'doctor', name='uq_monthly_stats_group'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    department = db.Column(db.String(100), nullable=False)
+    doctor = db.Column(db.String(200), nullable=False)
+    admissions = db.Column(db.Integer, nullable=False, default=0)
+    discharges = db.Column(db.Integer, nullable=False, default=0)
+    deaths = db.Column(db.Integer, nullable=False, default=0)
+    stay_days = db.Column(db.Integer, nullable=False, default=0)  # сума днів перебування виписаних
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MonthlyStat {self.year}-{self.month:02d} {self.department} / {self.doctor}>'
+
+
+class PatientChange(db.Model):
+    """
+    Журнал змін пацієнтів лише на додавання (app/changes.py). seq зростає
+    монотонно, тож споживач забирає зміни після останнього прочитаного.
+    """
+    __tablename__ = 'patient_changes'
+    # AUTOINCREMENT у SQLite: номери не використовуються повторно
+    __table_args__ = ({'sqlite_autoincrement': True},)
+    
+    seq = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, nullable=False, index=True)
+    operation = db.Column(db.String(10), nullable=False)  # create, update, delete
+    data = db.Column(db.JSON, nullable=True)  # знімок полів пацієнта після зміни (для delete - до)
+    user_id = db.Column(db.Integer, nullable=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Patient {self.full_name} - {self.history_number}>'
\ No newline at end of file
+        return f'<PatientChange {self.seq} {self.operation} {self.patient_id}>'
@@ -0,0 +1,94 @@
+"""
+Keyset-пагінація списку пацієнтів.
+
+Замість OFFSET сторінка визначається курсором - ключем сортування
+(admission_date, id) останнього або першого запису, тому будь-яка
+сторінка читається по індексу ix_patients_admission_date_id однаково швидко.
+Курсор непрозорий для клієнта: base64 від JSON.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+from flask import current_app
+from app import db, cache
+from app.models import Patient
+
+
+def encode_cursor(patient, direction):
+    payload = json.dumps([patient.admission_date.isoformat(), patient.id, direction])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Повертає (дата, id, напрямок) або None для порожнього/пошкодженого курсора"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, patient_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            return None
+        return date.fromisoformat(value), int(patient_id), direction
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+class KeysetPage:
+    """Сторінка результатів з курсорами на сусідні сторінки"""
+
+    def __init__(self, items, has_next, has_prev, total=None):
+        self.items = items
+        self.has_next = has_next and bool(items)
+        self.has_prev = has_prev and bool(items)
+        self.total = total
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.items[-1], 'next') if self.has_next else None
+
+    @property
+    def prev_cursor(self):
+        return encode_cursor(self.items[0], 'prev') if self.has_prev else None
+
+
+def keyset_paginate(query, cursor=None, per_page=50):
+    """
+    Сторінка запиту пацієнтів у порядку (admission_date desc, id desc).
+    Запит не повинен мати власного сортування.
+    """
+    key = decode_cursor(cursor)
+    newest_first = (Patient.admission_date.desc(), Patient.id.desc())
+
+    if key is None:
+        rows = query.order_by(*newest_first).limit(per_page + 1).all()
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_prev=False)
+
+    value, patient_id, direction = key
+    if direction == 'next':
+        rows = query.filter(db.or_(
+            Patient.admission_date < value,
+            db.and_(Patient.admission_date == value, Patient.id < patient_id)
+        )).order_by(*newest_first).limit(per_page + 1).all()
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_prev=True)
+
+    # Попередня сторінка: читаємо у зворотному порядку і розвертаємо
+    rows = query.filter(db.or_(
+        Patient.admission_date > value,
+        db.and_(Patient.admission_date == value, Patient.id > patient_id)
+    )).order_by(Patient.admission_date.asc(), Patient.id.asc()).limit(per_page + 1).all()
+    items = list(reversed(rows[:per_page]))
+    return KeysetPage(items, has_next=True, has_prev=len(rows) > per_page)
+
+
+def cached_count(query, version, params):
+    """
+    Кількість записів запиту з кешу. Ключ включає версію даних місяця,
+    тому після змін лічильник перераховується.
+    """
+    key = 'count:{}:{}'.format(version, json.dumps(params, sort_keys=True, ensure_ascii=False))
+    total = cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(key, total, timeout=current_app.config['PATIENTS_COUNT_CACHE_TIMEOUT'])
+    return total
@@ -0,0 +1,80 @@
+from datetime import date
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.sqlite import read_query
+
+# Роки, що приймаються з параметрів запиту: поза ними month_range для
+# сусідніх місяців вийшов би за межі datetime.date
+MIN_YEAR = 1900
+MAX_YEAR = 2100
+
+
+def month_range(year, month):
+    """Напіввідкритий діапазон дат [перше число місяця, перше число наступного)"""
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+    return start, end
+
+
+def filter_by_month(query, year, month, column=None):
+    """
+    Фільтр за місяцем у вигляді порівняння діапазону, а не extract(),
+    щоб база могла використати індекс по admission_date
+    """
+    column = column if column is not None else Patient.admission_date
+    start, end = month_range(year, month)
+    return query.filter(column >= start, column < end)
+
+
+def filter_patients(query, department='', doctor='', status='', model=Patient):
+    """
+    Додаткові фільтри списку та експорту: відділення, лікар, статус.
+    model - Patient або ArchivedPatient (ті самі колонки)
+    """
+    if department:
+        query = query.filter(model.department.ilike(f'%{department}%'))
+    if doctor:
+        query = query.filter(model.doctor.ilike(f'%{doctor}%'))
+    if status == 'deceased':
+        query = query.filter(model.is_deceased == True)
+    elif status == 'alive':
+        query = query.filter(model.is_deceased == False)
+    return query
+
+
+def month_patients_query(year, month, department='', doctor='', status=''):
+    """Базовий запит пацієнтів за місяць поступлення з фільтрами"""
+    query = filter_by_month(read_query(Patient), year, month)
+    return filter_patients(query, department=department, doctor=doctor, status=status)
+
+
+def month_fingerprint(year, month):
+    """
+    Відбиток даних місяця: змінюється при додаванні, редагуванні
+    або видаленні будь-якого пацієнта з цього місяця, а також при
+    архівуванні чи відновленні його записів
+    """
+    return period_fingerprint(*month_range(year, month))
+
+
+def period_fingerprint(start, end):
+    """Відбиток пацієнтів, що поступили в [start, end) (див. month_fingerprint)"""
+    count, max_id, last_update = db.session.query(
+        db.func.count(Patient.id),
+        db.func.max(Patient.id),
+        db.func.max(Patient.updated_at)
+    ).filter(Patient.admission_date >= start, Patient.admission_date < end).one()
+    # Експорт і перепис читають і архів: restore-archive чи archive
+    # в цьому періоді теж мають змінити відбиток
+    archived, archived_max_id, last_archived = db.session.query(
+        db.func.count(ArchivedPatient.id),
+        db.func.max(ArchivedPatient.id),
+        db.func.max(ArchivedPatient.archived_at)
+    ).filter(ArchivedPatient.admission_date >= start, ArchivedPatient.admission_date < end).one()
+    return ':'.join(str(part) for part in (
+        count, max_id, last_update.isoformat() if last_update else '',
+        archived, archived_max_id, last_archived.isoformat() if last_archived else ''
+    ))
@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app import db
+from app import db, cache, user_cache
+from app.metrics import pool_metrics
 from app.models import User
 from app.forms import UserForm
 from functools import wraps
@@ -54,6 +55,7 @@ def edit_user(id):
         if form.password.data:
             user.set_password(form.password.data)
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash('Дані користувача оновлено!', 'success')
         return redirect(url_for('admin.users'))
     
@@ -75,6 +77,7 @@ def delete_user(id):
     user = User.query.get_or_404(id)
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(id)
     flash('Користувача видалено!', 'success')
     return redirect(url_for('admin.users'))
 
@@ -89,5 +92,23 @@ def toggle_role(id):
     user = User.query.get_or_404(id)
     user.role = 'admin' if user.role == 'user' else 'user'
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash(f'Роль користувача змінено на {user.role}!', 'success')
-    return redirect(url_for('admin.users'))
\ No newline at end of file
+    return redirect(url_for('admin.users'))
+
+
+@admin.route('/metrics')
+@login_required
+@admin_required
+def metrics():
+    """Стан пулу з'єднань і кешу у форматі JSON (для підбору розміру пулу під навантаженням)"""
+    data = {
+        'database': db.engine.dialect.name,
+        'pool': pool_metrics(db.engine),
+        'cache': cache.stats(),
+        'user_cache': user_cache.stats(),
+    }
+    readonly_engine = current_app.extensions.get('readonly_engine')
+    if readonly_engine is not None:
+        data['readonly_pool'] = pool_metrics(readonly_engine)
+    return jsonify(data)
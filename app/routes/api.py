@@ -0,0 +1,350 @@
+"""
+JSON API пацієнтів, версія 1 (/api/v1).
+
+- GET /patients - список за місяцем поступлення з тими самими фільтрами,
+  що й patients.index, курсорна пагінація (next_cursor/prev_cursor) і
+  вибір полів (?fields=id,full_name).
+- GET /patients/<id> - один пацієнт.
+- POST /patients/batch - створення (без id) та оновлення (з id) багатьох
+  записів однією транзакцією: або зберігаються всі, або жоден. Оновлення
+  з version_id (з GET) відхиляється з 409, якщо запис уже змінили.
+- GET /changes?since=N - журнал змін після seq N (app/changes.py).
+
+Відповіді GET мають ETag: для списку - від відбитка даних місяця, для
+пацієнта - від updated_at. З If-None-Match незмінені дані повертають 304
+без читання сторінки.
+
+Доступ - за сесією користувача, як і решта застосунку. POST приймає лише
+application/json, тож звичайна HTML-форма з іншого сайту його не надішле.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from functools import wraps
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.queries import MIN_YEAR, MAX_YEAR, filter_by_month, filter_patients, month_fingerprint
+from app.search import apply_search
+from app.events import patient_months, patients_changed
+from app.changes import record_changes, changes_since, to_dict
+from app.pagination import keyset_paginate
+from app.sqlite import read_query
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+FIELDS = (
+    'id', 'admission_date', 'discharge_date', 'full_name', 'department', 'doctor',
+    'history_number', 'comment', 'is_deceased', 'death_date',
+    'created_by', 'created_at', 'updated_at', 'version_id'
+)
+# Поля, які можна передати в batch (решта заповнюється сервером)
+WRITABLE = (
+    'admission_date', 'discharge_date', 'full_name', 'department', 'doctor',
+    'history_number', 'comment', 'is_deceased', 'death_date'
+)
+REQUIRED = ('admission_date', 'full_name', 'department', 'doctor', 'history_number')
+DATE_FIELDS = ('admission_date', 'discharge_date', 'death_date')
+
+
+def error(message, status, **extra):
+    return jsonify({'error': message, **extra}), status
+
+
+def api_login_required(f):
+    """Як login_required, але 401 у JSON замість переходу на сторінку входу"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return error('Потрібна автентифікація.', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _fields():
+    """Запитані поля (?fields=a,b) у порядку FIELDS; None - помилка"""
+    value = request.args.get('fields', '')
+    if not value:
+        return FIELDS
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    if not requested or requested - set(FIELDS):
+        return None
+    return tuple(name for name in FIELDS if name in requested)
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def serialize(row, fields):
+    return {name: _value(getattr(row, name)) for name in fields}
+
+
+def _etag(*parts):
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag):
+    """304 з тим самим ETag, якщо клієнт уже має цю версію, інакше None"""
+    if etag not in request.if_none_match:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _with_etag(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    return response
+
+
+@api.route('/patients')
+@api_login_required
+def list_patients():
+    """Сторінка пацієнтів за місяць поступлення (новіші спочатку)"""
+    fields = _fields()
+    if fields is None:
+        return error('Невідоме поле у fields.', 400, fields=list(FIELDS))
+
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', now.month, type=int)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return error(f'Рік має бути від {MIN_YEAR} до {MAX_YEAR}.', 400)
+    if not 1 <= month <= 12:
+        return error('Місяць має бути від 1 до 12.', 400)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), current_app.config['API_PAGE_LIMIT'])
+    cursor = request.args.get('cursor')
+    search = request.args.get('search', '')
+    department = request.args.get('department', '')
+    doctor = request.args.get('doctor', '')
+    status = request.args.get('status', '')
+
+    # Відбиток змінюється з будь-якою зміною пацієнтів місяця - один
+    # агрегатний запит по індексу замість читання сторінки
+    etag = _etag(month_fingerprint(year, month), year, month, limit, cursor,
+                 search, department, doctor, status, fields)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    # Ключ курсора (admission_date, id) читається завжди, навіть якщо його немає у fields
+    columns = {name: getattr(Patient, name) for name in ('admission_date', 'id') + fields}
+    query = filter_by_month(read_query(*columns.values()), year, month)
+    if search:
+        query = apply_search(query, search, ranked=False)
+    query = filter_patients(query, department=department, doctor=doctor, status=status)
+    page = keyset_paginate(query, cursor=cursor, per_page=limit)
+
+    return _with_etag({
+        'items': [serialize(row, fields) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }, etag)
+
+
+@api.route('/patients/<int:id>')
+@api_login_required
+def get_patient(id):
+    fields = _fields()
+    if fields is None:
+        return error('Невідоме поле у fields.', 400, fields=list(FIELDS))
+    patient = read_query(Patient).filter(Patient.id == id).first()
+    if patient is None:
+        return error('Пацієнта не знайдено.', 404)
+    etag = _etag(patient.id, patient.updated_at, fields)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+    return _with_etag(serialize(patient, fields), etag)
+
+
+def parse_patient(item, update=False):
+    """
+    Перевірка одного запису batch. Повертає (значення, помилки).
+    Для оновлення обов'язкових полів немає - змінюються лише передані.
+    """
+    errors = {}
+    if not isinstance(item, dict):
+        return {}, {'': 'Запис має бути об\'єктом.'}
+    unknown = set(item) - set(WRITABLE) - {'id', 'version_id'}
+    for name in sorted(unknown):
+        errors[name] = 'Невідоме поле.'
+
+    values = {}
+    for name in WRITABLE:
+        if name not in item:
+            if not update and name in REQUIRED:
+                errors[name] = 'Обов\'язкове поле.'
+            continue
+        value = item[name]
+        if name in DATE_FIELDS:
+            if value in (None, ''):
+                value = None
+            else:
+                try:
+                    value = date.fromisoformat(value)
+                except (TypeError, ValueError):
+                    errors[name] = 'Дата у форматі РРРР-ММ-ДД.'
+                    continue
+        elif name == 'is_deceased':
+            if not isinstance(value, bool):
+                errors[name] = 'Має бути true або false.'
+                continue
+        elif value is not None and not isinstance(value, str):
+            errors[name] = 'Має бути рядком.'
+            continue
+        elif isinstance(value, str):
+            value = value.strip()
+            length = getattr(Patient.__table__.c[name].type, 'length', None)
+            if length and len(value) > length:
+                errors[name] = f'Не довше {length} символів.'
+                continue
+        if name in REQUIRED and not value:
+            errors[name] = 'Обов\'язкове поле.'
+            continue
+        values[name] = value
+    return values, errors
+
+
+def _existing_numbers(numbers, chunk_size=900):
+    """Номер історії -> id пацієнта для номерів, що вже є в базі або в архіві"""
+    numbers = list(numbers)
+    existing = {}
+    for model in (Patient, ArchivedPatient):
+        for start in range(0, len(numbers), chunk_size):
+            chunk = numbers[start:start + chunk_size]
+            existing.update(db.session.query(model.history_number, model.id).filter(
+                model.history_number.in_(chunk)
+            ))
+    return existing
+
+
+@api.route('/patients/batch', methods=['POST'])
+@api_login_required
+def batch():
+    """
+    Створення та оновлення пацієнтів однією транзакцією.
+    Тіло: {"patients": [{...}, {"id": 5, ...}]}
+    """
+    if not request.is_json:
+        return error('Очікується application/json.', 415)
+    payload = request.get_json(silent=True)
+    items = payload.get('patients') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return error('Очікується непорожній список patients.', 400)
+    if len(items) > current_app.config['API_BATCH_LIMIT']:
+        return error(f'Не більше {current_app.config["API_BATCH_LIMIT"]} записів за раз.', 413)
+
+    errors = []
+    parsed = []
+    versions = {}  # index -> version_id, яку бачив клієнт
+    for index, item in enumerate(items):
+        patient_id = item.get('id') if isinstance(item, dict) else None
+        if patient_id is not None and (not isinstance(patient_id, int) or isinstance(patient_id, bool)):
+            errors.append({'index': index, 'field': 'id', 'message': 'Має бути цілим числом.'})
+            continue
+        version = item.get('version_id') if isinstance(item, dict) else None
+        if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+            errors.append({'index': index, 'field': 'version_id', 'message': 'Має бути цілим числом.'})
+            continue
+        values, item_errors = parse_patient(item, update=patient_id is not None)
+        errors.extend({'index': index, 'field': name, 'message': message}
+                      for name, message in item_errors.items())
+        parsed.append((index, patient_id, values))
+        if version is not None and patient_id is not None:
+            versions[index] = version
+
+    # Пацієнти для оновлення - одним запитом
+    ids = {patient_id for _, patient_id, _ in parsed if patient_id is not None}
+    patients = {patient.id: patient for patient in Patient.query.filter(Patient.id.in_(ids))} if ids else {}
+    for index, patient_id, _ in parsed:
+        if patient_id is not None and patient_id not in patients:
+            errors.append({'index': index, 'field': 'id', 'message': 'Пацієнта не знайдено.'})
+
+    # Унікальність номерів історії: у межах запиту та з базою
+    numbers = {}
+    for index, patient_id, values in parsed:
+        number = values.get('history_number')
+        if number is None:
+            continue
+        if number in numbers:
+            errors.append({'index': index, 'field': 'history_number', 'message': 'Номер повторюється у запиті.'})
+        numbers[number] = patient_id
+    existing = _existing_numbers(numbers)
+    for index, patient_id, values in parsed:
+        owner = existing.get(values.get('history_number'))
+        if owner is not None and owner != patient_id:
+            errors.append({'index': index, 'field': 'history_number', 'message': 'Цей номер історії вже використовується.'})
+
+    if errors:
+        return error('Дані не збережено.', 422, errors=sorted(errors, key=lambda item: item['index']))
+
+    # Оптимістичне блокування: запис змінено після того, як клієнт його прочитав
+    conflicts = [
+        {'index': index, 'id': patient_id, 'version_id': patients[patient_id].version_id}
+        for index, patient_id, _ in parsed
+        if index in versions and versions[index] != patients[patient_id].version_id
+    ]
+    if conflicts:
+        return error('Записи змінено іншим користувачем, перечитайте їх.', 409, conflicts=conflicts)
+
+    months = set()
+    created, updated = [], []
+    now = datetime.utcnow()
+    for index, patient_id, values in parsed:
+        if patient_id is None:
+            patient = Patient(**{'is_deceased': False, **values}, created_by=current_user.id)
+            db.session.add(patient)
+            created.append(patient)
+        else:
+            patient = patients[patient_id]
+            months |= patient_months(patient)
+            for name, value in values.items():
+                setattr(patient, name, value)
+            patient.updated_at = now
+            updated.append(patient)
+        # Як у формі: дата смерті лише для померлих
+        if not patient.is_deceased:
+            patient.death_date = None
+        months |= patient_months(patient)
+
+    try:
+        db.session.flush()
+        record_changes('create', created, current_user.id)
+        record_changes('update', updated, current_user.id)
+        db.session.commit()
+    except (IntegrityError, StaleDataError):
+        # Номер історії зайняли або пацієнта змінили паралельно з цим запитом
+        db.session.rollback()
+        return error('Конфлікт даних, повторіть запит.', 409)
+    patients_changed(months)
+
+    return jsonify({
+        'created': [patient.id for patient in created],
+        'updated': [patient.id for patient in updated],
+    })
+
+
+@api.route('/changes')
+@api_login_required
+def changes():
+    """
+    Стрічка змін пацієнтів після seq since (за зростанням seq).
+    Наступний запит - з since=next_since, поки has_more.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), current_app.config['CHANGES_FEED_LIMIT'])
+    rows, has_more = changes_since(since, limit)
+    return jsonify({
+        'changes': [to_dict(change) for change in rows],
+        'next_since': rows[-1].seq if rows else since,
+        'has_more': has_more,
+    })
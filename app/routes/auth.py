@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user
-from app import db
+from app import db, login_security
+from app.security import LoginBusy
 from app.models import User
 from app.forms import LoginForm
 
@@ -13,8 +14,22 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        # Ліміт спроб для імені користувача та IP-адреси
+        retry_after = login_security.rate_limited(form.username.data, request.remote_addr)
+        if retry_after:
+            flash(f'Забагато спроб входу. Спробуйте через {retry_after} с.', 'danger')
+            return render_template('login.html', form=form), 429
+        
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            # Перевірка bcrypt у пулі потоків; для неіснуючого користувача - фіктивна
+            valid = login_security.verify(user, form.password.data)
+        except LoginBusy:
+            flash('Сервер зайнятий, спробуйте увійти ще раз за кілька секунд.', 'warning')
+            return render_template('login.html', form=form), 503
+        
+        if valid:
+            login_security.rehash_if_needed(user, form.password.data)
             login_user(user)
             next_page = request.args.get('next')
             flash('Вхід виконано успішно!', 'success')
@@ -1,12 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, send_file
+from flask import (Blueprint, render_template, redirect, url_for, flash, abort,
+                   jsonify, send_file, stream_with_context)
 from flask_login import login_required, current_user
 from app.forms import ExportForm
-from app.models import Patient
-from app import db
+from app import jobs
+from app.exporters import (EXPORT_FORMATS, SPLITS, build_export_query, export_filename, export_cache_key,
+                           export_extra_sheets, export_split, write_export, stream_export, run_export_job,
+                           temporary_export_path, attachment_response, download_response)
 from functools import wraps
-from datetime import datetime
-import pandas as pd
-from io import BytesIO
+import os
 
 export_bp = Blueprint('export', __name__, url_prefix='/export')
 
@@ -34,14 +35,28 @@ def export_form():
         department = form.department.data.strip() if form.department.data else None
         doctor = form.doctor.data.strip() if form.doctor.data else None
         include_deceased = form.include_deceased.data
+        file_format = form.file_format.data
         
-        # Перенаправляємо на експорт з параметрами
-        return redirect(url_for('export.export_data', 
-                              month=month, 
-                              year=year,
-                              department=department,
-                              doctor=doctor,
-                              include_deceased=include_deceased))
+        params = {
+            'month': month,
+            'year': year,
+            'department': department or '',
+            'doctor': doctor or '',
+            'include_deceased': include_deceased,
+            'format': file_format,
+            'split': form.split.data or '',
+        }
+        if form.period.data == 'range':
+            # Кілька місяців - один запит і одна книга замість експорту кожного місяця
+            params['end_month'] = int(form.end_month.data)
+            params['end_year'] = int(form.end_year.data)
+        
+        # Експорт виконується у фоні; однакові параметри при незмінних
+        # даних періоду повертають уже готовий файл
+        job_id = jobs.submit('export', params, run_export_job,
+                             cache_key=export_cache_key(params),
+                             user_id=current_user.id)
+        return redirect(url_for('export.job_status', job_id=job_id))
     
     return render_template('export_form.html', form=form)
 
@@ -50,7 +65,7 @@ def export_form():
 @login_required
 @admin_required
 def export_data():
-    """Експорт даних пацієнтів в Excel"""
+    """Експорт даних пацієнтів в Excel, CSV, JSON Lines або Parquet"""
     from flask import request
     
     # Отримуємо параметри з URL
@@ -59,96 +74,127 @@ def export_data():
     department = request.args.get('department', '')
     doctor = request.args.get('doctor', '')
     include_deceased = request.args.get('include_deceased', 'True') == 'True'
+    file_format = request.args.get('format', 'xlsx')
+    end_month = request.args.get('end_month', type=int)
+    end_year = request.args.get('end_year', type=int)
+    split = request.args.get('split', '')
     
     # Перевірка обов'язкових параметрів
     if not month or not year:
         flash('Не вказано місяць або рік для експорту.', 'danger')
         return redirect(url_for('export.export_form'))
+    if not 1 <= month <= 12 or (end_year and not 1 <= (end_month or 0) <= 12):
+        flash('Місяць має бути від 1 до 12.', 'danger')
+        return redirect(url_for('export.export_form'))
+    if end_year and (end_year, end_month) < (year, month):
+        flash('Кінець періоду раніше за його початок.', 'danger')
+        return redirect(url_for('export.export_form'))
+    if split and split not in SPLITS:
+        flash('Невідомий спосіб розбиття на аркуші.', 'danger')
+        return redirect(url_for('export.export_form'))
+    if file_format not in EXPORT_FORMATS:
+        flash('Невідомий формат експорту.', 'danger')
+        return redirect(url_for('export.export_form'))
+    
+    extension, mimetype, streamed = EXPORT_FORMATS[file_format]
+    
+    params = {
+        'month': month,
+        'year': year,
+        'department': department,
+        'doctor': doctor,
+        'include_deceased': include_deceased,
+        'format': file_format,
+        'split': split,
+    }
+    if end_year:
+        params['end_month'] = end_month
+        params['end_year'] = end_year
     
     try:
-        # Формуємо запит до бази даних
-        query = Patient.query.filter(
-            db.extract('month', Patient.admission_date) == month,
-            db.extract('year', Patient.admission_date) == year
-        )
-        
-        # Додаткові фільтри
-        if department:
-            query = query.filter(Patient.department.ilike(f'%{department}%'))
-        if doctor:
-            query = query.filter(Patient.doctor.ilike(f'%{doctor}%'))
-        if not include_deceased:
-            query = query.filter(Patient.is_deceased == False)
+        query = build_export_query(params)
+        filename = export_filename(params)
         
-        # Сортування
-        query = query.order_by(Patient.admission_date.desc())
+        if streamed:
+            # CSV та JSON Lines пишуться у відповідь під час читання з бази,
+            # тому наявність даних перевіряємо заздалегідь
+            if query.first() is None:
+                flash('Не знайдено пацієнтів за обраний період.', 'warning')
+                return redirect(url_for('export.export_form'))
+            return attachment_response(
+                stream_with_context(stream_export(file_format, query)),
+                mimetype=mimetype,
+                filename=filename
+            )
         
-        # Отримуємо дані
-        patients = query.all()
+        # Рядки читаються порціями і одразу пишуться у файл на диску
+        path = temporary_export_path(extension)
+        try:
+            count = write_export(file_format, query, path, extra_sheets=export_extra_sheets(params),
+                                 split=export_split(params))
+        except Exception:
+            os.remove(path)
+            raise
         
-        if not patients:
-            flash(f'Не знайдено пацієнтів за {month}/{year}.', 'warning')
+        if not count:
+            os.remove(path)
+            flash('Не знайдено пацієнтів за обраний період.', 'warning')
             return redirect(url_for('export.export_form'))
         
-        # Підготовка даних для Excel
-        data = []
-        for p in patients:
-            data.append({
-                'Дата поступлення': p.admission_date.strftime('%d.%m.%Y'),
-                'Дата виписки': p.discharge_date.strftime('%d.%m.%Y') if p.discharge_date else '',
-                'ПІБ': p.full_name,
-                'Відділення': p.department,
-                'Лікар': p.doctor,
-                '№ Історії': p.history_number,
-                'Коментар': p.comment or '',
-                'Статус': 'Помер' if p.is_deceased else 'Живий',
-                'Створено': p.created_at.strftime('%d.%m.%Y %H:%M'),
-                'Оновлено': p.updated_at.strftime('%d.%m.%Y %H:%M')
-            })
+        flash(f'Експортовано {count} пацієнтів.', 'success')
         
-        # Створюємо DataFrame
-        df = pd.DataFrame(data)
-        
-        # Створюємо Excel файл
-        output = BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Пацієнти')
-            
-            # Отримуємо worksheet для форматування
-            worksheet = writer.sheets['Пацієнти']
-            
-            # Автоматичне налаштування ширини колонок
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        output.seek(0)
-        
-        # Назва файлу
-        month_names = [
-            'Січень', 'Лютий', 'Березень', 'Квітень', 'Травень', 'Червень',
-            'Липень', 'Серпень', 'Вересень', 'Жовтень', 'Листопад', 'Грудень'
-        ]
-        filename = f'Пацієнти_{month_names[month-1]}_{year}.xlsx'
-        
-        flash(f'Експортовано {len(patients)} пацієнтів.', 'success')
-        
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
-        )
+        # Файл віддається частинами і видаляється після відправки
+        return download_response(path, mimetype=mimetype, filename=filename)
         
     except Exception as e:
         flash(f'Помилка при експорті: {str(e)}', 'danger')
-        return redirect(url_for('export.export_form'))
\ No newline at end of file
+        return redirect(url_for('export.export_form'))
+
+
+def _get_export_job(job_id):
+    job = jobs.get(job_id)
+    if job is None or job['kind'] != 'export':
+        abort(404)
+    return job
+
+
+@export_bp.route('/jobs/<job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    """Сторінка прогресу фонового експорту"""
+    job = _get_export_job(job_id)
+    return render_template('export_job.html', job=job)
+
+
+@export_bp.route('/jobs/<job_id>/status')
+@login_required
+@admin_required
+def job_status_json(job_id):
+    """Стан фонового експорту для опитування зі сторінки"""
+    job = _get_export_job(job_id)
+    return jsonify({
+        'status': job['status'],
+        'progress': job['progress'],
+        'total': job['total'],
+        'error': job['error'],
+        'download_url': url_for('export.job_download', job_id=job_id) if job['status'] == 'done' else None,
+    })
+
+
+@export_bp.route('/jobs/<job_id>/download')
+@login_required
+@admin_required
+def job_download(job_id):
+    """Завантаження готового файлу фонового експорту"""
+    job = _get_export_job(job_id)
+    if job['status'] != 'done' or not job['result_path'] or not os.path.exists(job['result_path']):
+        flash('Файл експорту недоступний або його термін зберігання минув.', 'warning')
+        return redirect(url_for('export.export_form'))
+    
+    return send_file(
+        job['result_path'],
+        mimetype=EXPORT_FORMATS[job['params']['format']][1],
+        as_attachment=True,
+        download_name=job['filename']
+    )
@@ -0,0 +1,113 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, abort, jsonify, current_app
+from flask_login import login_required, current_user
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.forms import ImportForm
+from app import jobs
+from app.importer import run_import_check_job, run_import_job
+from functools import wraps
+import os
+import uuid
+
+imports = Blueprint('imports', __name__, url_prefix='/import')
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.is_admin():
+            flash('У вас немає доступу до цієї сторінки.', 'danger')
+            return redirect(url_for('patients.index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@imports.errorhandler(RequestEntityTooLarge)
+def file_too_large(e):
+    """Файл більший за MAX_CONTENT_LENGTH - повідомлення замість сторінки 413"""
+    limit = current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f'Файл завеликий: імпорт приймає файли до {limit} МБ.', 'danger')
+    return redirect(url_for('imports.import_form'))
+
+
+@imports.route('/', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_form():
+    """Завантаження Excel-файлу для імпорту"""
+    form = ImportForm()
+
+    if form.validate_on_submit():
+        upload = form.file.data
+        extension = os.path.splitext(upload.filename)[1].lower()
+        path = os.path.join(jobs.storage_dir, f'upload_{uuid.uuid4().hex}{extension}')
+
+        # Файл копіюється на диск частинами, не читаючись у пам'ять цілком
+        upload.save(path)
+
+        params = {
+            'path': path,
+            'filename': upload.filename,
+        }
+
+        # Перевірка виконується у фоні; результат - попередній перегляд
+        job_id = jobs.submit('import-check', params, run_import_check_job,
+                             user_id=current_user.id)
+        return redirect(url_for('imports.job_status', job_id=job_id))
+
+    return render_template('import_form.html', form=form)
+
+
+def _get_import_job(job_id):
+    job = jobs.get(job_id)
+    if job is None or job['kind'] not in ('import-check', 'import'):
+        abort(404)
+    return job
+
+
+@imports.route('/jobs/<job_id>')
+@login_required
+@admin_required
+def job_status(job_id):
+    """Прогрес перевірки або імпорту, попередній перегляд зауважень"""
+    job = _get_import_job(job_id)
+    return render_template('import_job.html', job=job)
+
+
+@imports.route('/jobs/<job_id>/status')
+@login_required
+@admin_required
+def job_status_json(job_id):
+    """Стан завдання імпорту для опитування зі сторінки"""
+    job = _get_import_job(job_id)
+    return jsonify({
+        'status': job['status'],
+        'progress': job['progress'],
+        'total': job['total'],
+        'error': job['error'],
+    })
+
+
+@imports.route('/jobs/<job_id>/confirm', methods=['POST'])
+@login_required
+@admin_required
+def confirm(job_id):
+    """Запуск запису перевіреного файлу в базу"""
+    check = _get_import_job(job_id)
+    if check['kind'] != 'import-check' or check['status'] != 'done':
+        abort(404)
+
+    params = {
+        'path': check['params']['path'],
+        'filename': check['params']['filename'],
+        'user_id': current_user.id,
+        'check_job': job_id,
+    }
+
+    # Повторне підтвердження того самого файлу повертає вже запущене завдання
+    cache_key = f'import:{job_id}'
+    if not os.path.exists(params['path']) and not (jobs.find_cached(cache_key) or jobs.find_active(cache_key)):
+        flash('Файл імпорту недоступний або його термін зберігання минув.', 'warning')
+        return redirect(url_for('imports.import_form'))
+
+    import_job_id = jobs.submit('import', params, run_import_job,
+                                cache_key=cache_key, user_id=current_user.id)
+    return redirect(url_for('imports.job_status', job_id=import_job_id))
@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
-from app import db
+from sqlalchemy.orm.exc import StaleDataError
+from app import db, cache
 from app.models import Patient
 from app.forms import PatientForm
+from app.queries import filter_by_month, filter_patients
+from app.search import apply_search
+from app.facets import month_facets
+from app.events import month_key, patient_months, patients_changed
+from app.changes import record_changes
+from app.pagination import keyset_paginate, cached_count
+from app.sqlite import read_query
+from app.http_cache import cached_page
 from functools import wraps
 
 patients = Blueprint('patients', __name__)
@@ -21,6 +30,7 @@ def admin_required(f):
 @login_required
 def index():
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     department = request.args.get('department', '')
     doctor = request.args.get('doctor', '')
@@ -30,49 +40,53 @@ def index():
     current_month = datetime.now().month
     current_year = datetime.now().year
     
-    query = Patient.query
+    def render():
+        # Фільтр за поточний місяць (діапазон дат, щоб працював індекс)
+        # Читання через двигун тільки для читання (SQLite), щоб не чекати на запис
+        query = filter_by_month(read_query(Patient), current_year, current_month)
+        
+        keyset = current_app.config['PATIENTS_PAGINATION'] == 'keyset'
+        
+        # Пошук (ранжування за релевантністю лише для посторінкової пагінації,
+        # курсор прив'язаний до порядку за датою)
+        if search:
+            query = apply_search(query, search, ranked=not keyset)
+        
+        # Фільтри
+        query = filter_patients(query, department=department, doctor=doctor, status=status)
+        
+        # Пагінація, новіші пацієнти спочатку
+        if keyset:
+            pagination = keyset_paginate(query, cursor=cursor, per_page=50)
+            if current_app.config['PATIENTS_SHOW_TOTAL']:
+                pagination.total = cached_count(
+                    query,
+                    version=cache.version(month_key(current_year, current_month)),
+                    params=[current_year, current_month, search, department, doctor, status]
+                )
+        else:
+            query = query.order_by(Patient.admission_date.desc(), Patient.id.desc())
+            pagination = query.paginate(page=page, per_page=50, error_out=False)
+        patients_list = pagination.items
+        
+        # Для фільтрів - значення з кількістю пацієнтів за місяць (з кешу)
+        facets = month_facets(current_year, current_month)
+        
+        return render_template('patients_list.html', 
+                             patients=patients_list, 
+                             pagination=pagination,
+                             keyset=keyset,
+                             departments=facets['departments'],
+                             doctors=facets['doctors'])
     
-    # Фільтр за поточний місяць
-    query = query.filter(
-        db.extract('month', Patient.admission_date) == current_month,
-        db.extract('year', Patient.admission_date) == current_year
+    # Готова сторінка з кешу до будь-якого запису пацієнтів; у ключі -
+    # користувач (ім'я і роль видно в меню) та всі параметри списку
+    return cached_page(
+        'patients', 'patients',
+        [current_user.id, current_user.role, current_year, current_month,
+         page, cursor, search, department, doctor, status],
+        render, timeout=current_app.config['PATIENTS_PAGE_CACHE_TIMEOUT']
     )
-    
-    # Пошук
-    if search:
-        query = query.filter(
-            db.or_(
-                Patient.full_name.ilike(f'%{search}%'),
-                Patient.history_number.ilike(f'%{search}%')
-            )
-        )
-    
-    # Фільтри
-    if department:
-        query = query.filter(Patient.department.ilike(f'%{department}%'))
-    if doctor:
-        query = query.filter(Patient.doctor.ilike(f'%{doctor}%'))
-    if status == 'deceased':
-        query = query.filter(Patient.is_deceased == True)
-    elif status == 'alive':
-        query = query.filter(Patient.is_deceased == False)
-    
-    # Сортування за датою поступлення (новіші спочатку)
-    query = query.order_by(Patient.admission_date.desc())
-    
-    # Пагінація
-    pagination = query.paginate(page=page, per_page=50, error_out=False)
-    patients_list = pagination.items
-    
-    # Для фільтрів - унікальні значення
-    departments = db.session.query(Patient.department).distinct().all()
-    doctors = db.session.query(Patient.doctor).distinct().all()
-    
-    return render_template('patients_list.html', 
-                         patients=patients_list, 
-                         pagination=pagination,
-                         departments=[d[0] for d in departments],
-                         doctors=[d[0] for d in doctors])
 
 @patients.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -92,12 +106,48 @@ def add():
             created_by=current_user.id
         )
         db.session.add(patient)
+        db.session.flush()
+        record_changes('create', [patient], current_user.id)
         db.session.commit()
+        patients_changed(patient_months(patient))
         flash('Пацієнта успішно додано!', 'success')
         return redirect(url_for('patients.index'))
     
     return render_template('patient_form.html', form=form, title='Додати пацієнта')
 
+# Поля, що порівнюються при конфлікті редагування
+EDIT_FIELDS = ('admission_date', 'discharge_date', 'full_name', 'department', 'doctor',
+               'history_number', 'comment', 'is_deceased', 'death_date')
+
+def _display(value):
+    if isinstance(value, bool):
+        return 'Так' if value else 'Ні'
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d.%m.%Y')
+    return value or '—'
+
+def edit_conflict(form, patient):
+    """
+    Запис змінив інший користувач після того, як цей відкрив форму.
+    Нічого не зберігається: форма показується знову з введеними даними і
+    різницею з поточною версією, а прихована версія оновлюється, тож
+    повторне «Зберегти» свідомо записує ці дані поверх нової версії.
+    """
+    mine = {name: form[name].data for name in EDIT_FIELDS}
+    if not form.is_deceased.data:
+        mine['death_date'] = None
+    # Порожній рядок і None (або False) вважаються однаковими
+    diff = [
+        {'label': form[name].label.text, 'mine': _display(mine[name]), 'theirs': _display(getattr(patient, name))}
+        for name in EDIT_FIELDS
+        if (mine[name] or None) != (getattr(patient, name) or None)
+    ]
+    form.version_id.raw_data = None
+    form.version_id.data = patient.version_id
+    form.original_history_number = patient.history_number
+    return render_template('patient_form.html', form=form, title='Редагувати пацієнта',
+                           conflict=diff), 409
+
 @patients.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit(id):
@@ -105,6 +155,11 @@ def edit(id):
     form = PatientForm(original_history_number=patient.history_number)
     
     if form.validate_on_submit():
+        # Оптимістичне блокування: форму відкрито на старішій версії
+        if form.version_id.data is not None and form.version_id.data != patient.version_id:
+            return edit_conflict(form, patient)
+        
+        months = patient_months(patient)
         patient.admission_date = form.admission_date.data
         patient.discharge_date = form.discharge_date.data
         patient.full_name = form.full_name.data
@@ -116,7 +171,18 @@ def edit(id):
         patient.death_date = form.death_date.data if form.is_deceased.data else None  # ОНОВЛЕНО
         patient.updated_at = datetime.utcnow()
         
-        db.session.commit()
+        try:
+            # UPDATE ... WHERE version_id = <прочитана>: запис змінили між читанням і записом
+            record_changes('update', [patient], current_user.id)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            patient = db.session.get(Patient, id)
+            if patient is None:
+                flash('Пацієнта видалив інший користувач.', 'warning')
+                return redirect(url_for('patients.index'))
+            return edit_conflict(form, patient)
+        patients_changed(months | patient_months(patient))
         flash('Дані пацієнта оновлено!', 'success')
         return redirect(url_for('patients.index'))
     
@@ -130,6 +196,7 @@ def edit(id):
         form.comment.data = patient.comment
         form.is_deceased.data = patient.is_deceased
         form.death_date.data = patient.death_date  # ОНОВЛЕНО
+        form.version_id.data = patient.version_id
     
     return render_template('patient_form.html', form=form, title='Редагувати пацієнта')
 
@@ -138,7 +205,16 @@ def edit(id):
 @admin_required
 def delete(id):
     patient = Patient.query.get_or_404(id)
+    months = patient_months(patient)
+    record_changes('delete', [patient], current_user.id)
     db.session.delete(patient)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except StaleDataError:
+        # Запис змінили під час видалення - видаляти застарілу версію не можна
+        db.session.rollback()
+        flash('Пацієнта щойно змінив інший користувач. Перевірте дані і спробуйте ще раз.', 'warning')
+        return redirect(url_for('patients.index'))
+    patients_changed(months)
     flash('Пацієнта видалено!', 'success')
     return redirect(url_for('patients.index'))
\ No newline at end of file
@@ -0,0 +1,78 @@
+from flask import Blueprint, render_template, request, jsonify
+from flask_login import login_required
+from datetime import datetime
+from app.stats import GROUPS, month_stats, year_stats
+from app.census import month_census
+from app.facets import month_facets
+from app.exporters import MONTH_NAMES
+from app.queries import MIN_YEAR, MAX_YEAR
+
+stats = Blueprint('stats', __name__, url_prefix='/stats')
+
+
+def _params():
+    """Рік, місяць і групування з параметрів запиту (за замовчуванням - поточний місяць)"""
+    now = datetime.now()
+    year = request.args.get('year', now.year, type=int)
+    month = request.args.get('month', now.month, type=int)
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        year = now.year
+    if not 1 <= month <= 12:
+        month = now.month
+    group = request.args.get('group', 'department')
+    if group not in GROUPS:
+        group = 'department'
+    return year, month, group
+
+
+@stats.route('/')
+@login_required
+def dashboard():
+    """Статистика за місяць: поступлення, виписки, смерті, середній ліжко-день"""
+    year, month, group = _params()
+    return render_template('stats_dashboard.html',
+                           year=year, month=month, group=group,
+                           month_names=MONTH_NAMES,
+                           current=month_stats(year, month, group),
+                           months=year_stats(year))
+
+
+@stats.route('/data')
+@login_required
+def data():
+    """Те саме у форматі JSON"""
+    year, month, group = _params()
+    return jsonify({
+        'year': year,
+        'month': month,
+        'group': group,
+        **month_stats(year, month, group),
+        'months': year_stats(year),
+    })
+
+
+@stats.route('/census')
+@login_required
+def census():
+    """Щоденна зайнятість ліжок за місяць по відділеннях"""
+    year, month, _ = _params()
+    department = request.args.get('department', '')
+    return render_template('stats_census.html',
+                           year=year, month=month, department=department,
+                           month_names=MONTH_NAMES,
+                           departments=month_facets(year, month)['departments'],
+                           census=month_census(year, month, department=department))
+
+
+@stats.route('/census/data')
+@login_required
+def census_data():
+    """Зайнятість ліжок у форматі JSON"""
+    year, month, _ = _params()
+    department = request.args.get('department', '')
+    return jsonify({
+        'year': year,
+        'month': month,
+        'department': department,
+        **month_census(year, month, department=department).to_dict(),
+    })
@@ -0,0 +1,106 @@
+from app import db
+from app.models import Patient, ArchivedPatient
+from app.search import install_search_index
+
+
+def add_column(table, column):
+    """
+    ALTER TABLE ... ADD COLUMN для колонки, доданої до моделі пізніше.
+    Обов'язкова колонка має мати server_default - ним заповнюються наявні рядки
+    """
+    sql = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}'
+    if column.server_default is not None:
+        default = column.server_default.arg
+        if isinstance(default, str):
+            default = "'{}'".format(default.replace("'", "''"))
+        else:
+            default = default.text
+        sql += f' DEFAULT {default}'
+    if not column.nullable:
+        sql += ' NOT NULL'
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(sql)
+
+
+def rebuild_autoincrement(table, floor_tables=()):
+    """
+    SQLite: перебудова таблиці, створеної без AUTOINCREMENT (sqlite_autoincrement
+    у моделі), - інакше ALTER TABLE цього не змінює. Нова таблиця створюється
+    поруч, дані копіюються, стара видаляється разом з індексами й тригерами,
+    нова перейменовується і отримує індекси моделі. Лічильник sqlite_sequence
+    не менший за найбільший id у floor_tables (архів), щоб ці id більше не
+    видавались. Повертає True, якщо таблицю перебудовано.
+    """
+    if db.engine.dialect.name != 'sqlite' or not table.dialect_options['sqlite']['autoincrement']:
+        return False
+    with db.engine.connect() as conn:
+        sql = conn.execute(db.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {'name': table.name}).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return False
+
+    rebuild_name = f'{table.name}_rebuild'
+    # Копія таблиці під іншою назвою; таблиці, на які є зовнішні ключі,
+    # потрібні лише для компіляції REFERENCES
+    metadata = db.MetaData()
+    for column in table.columns:
+        for key in column.foreign_keys:
+            key.column.table.to_metadata(metadata)
+    rebuild = table.to_metadata(metadata, name=rebuild_name)
+    existing = [column['name'] for column in db.inspect(db.engine).get_columns(table.name)]
+    columns = ', '.join(name for name in existing if name in table.columns)
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f'DROP TABLE IF EXISTS {rebuild_name}')
+        conn.execute(db.schema.CreateTable(rebuild))
+        conn.exec_driver_sql(f'INSERT INTO {rebuild_name} ({columns}) SELECT {columns} FROM {table.name}')
+        conn.exec_driver_sql(f'DROP TABLE {table.name}')
+        conn.exec_driver_sql(f'ALTER TABLE {rebuild_name} RENAME TO {table.name}')
+        for index in table.indexes:
+            index.create(bind=conn)
+        highest = ' UNION ALL '.join(f'SELECT MAX(id) AS id FROM {name}' for name in (table.name, *floor_tables))
+        conn.exec_driver_sql(f"DELETE FROM sqlite_sequence WHERE name = '{table.name}'")
+        conn.exec_driver_sql(f"INSERT INTO sqlite_sequence (name, seq) "
+                             f"SELECT '{table.name}', COALESCE(MAX(id), 0) FROM ({highest})")
+    return True
+
+
+def upgrade_schema():
+    """
+    Оновлення схеми існуючої бази без втрати даних.
+
+    db.create_all() створює лише відсутні таблиці, тому колонки та індекси,
+    додані до вже існуючих таблиць, створюються тут окремо. Функцію можна
+    запускати повторно - вона нічого не робить, якщо схема актуальна.
+    """
+    db.create_all()
+
+    created = []
+    # Тригери пошуку видаляються разом зі старою таблицею і створюються
+    # знову в install_search_index нижче
+    if rebuild_autoincrement(Patient.__table__, floor_tables=(ArchivedPatient.__tablename__,)):
+        created.append(f'{Patient.__tablename__} AUTOINCREMENT')
+
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                add_column(table, column)
+                created.append(f'{table.name}.{column.name}')
+
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+
+    if install_search_index(db.engine):
+        created.append('patients_fts')
+
+    if created:
+        # Оновлюємо статистику планувальника, щоб нові індекси одразу використовувались
+        with db.engine.begin() as conn:
+            conn.execute(db.text('ANALYZE'))
+
+    return created
@@ -0,0 +1,174 @@
+"""
+Пошук пацієнтів за ПІБ та № історії.
+
+SQLite: зовнішньо-контентна таблиця FTS5 patients_fts, яку синхронізують
+тригери на patients (додавання, редагування, видалення, імпорт).
+Токенізатор unicode61 приводить до нижнього регістру і кирилицю, тому
+"іван" знаходить "Іваненко". Апострофи (', ʼ, ’) є роздільниками, щоб
+"Мар'яна" і "Марʼяна" шукались однаково.
+
+PostgreSQL: trigram-індекс (pg_trgm) по lower(full_name) та
+індекс для пошуку за префіксом № історії.
+
+Якщо індекс недоступний - використовується звичайний ILIKE.
+"""
+import re
+from app import db
+from app.models import Patient
+
+FTS_TABLE = 'patients_fts'
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        full_name, history_number,
+        content='patients', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 0 separators 'ʼ’`'",
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_name, history_number)
+        VALUES (new.id, new.full_name, new.history_number);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, history_number)
+        VALUES ('delete', old.id, old.full_name, old.history_number);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF full_name, history_number ON patients BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, history_number)
+        VALUES ('delete', old.id, old.full_name, old.history_number);
+        INSERT INTO {FTS_TABLE}(rowid, full_name, history_number)
+        VALUES (new.id, new.full_name, new.history_number);
+    END""",
+]
+
+POSTGRES_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_patients_full_name_trgm '
+    'ON patients USING gin (lower(full_name) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS ix_patients_history_number_prefix '
+    'ON patients (lower(history_number) varchar_pattern_ops)',
+]
+
+# Кеш перевірки наявності індексу для кожного engine
+_available = {}
+
+
+def install_search_index(engine):
+    """
+    Створює пошуковий індекс, якщо його ще немає.
+    Повертає True, якщо індекс було створено (і заповнено) щойно.
+    """
+    _available.pop(engine.url, None)
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        with engine.begin() as conn:
+            exists = conn.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+            for statement in SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+            if not exists:
+                # Заповнюємо індекс існуючими записами
+                conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        return not exists
+
+    if dialect == 'postgresql':
+        with engine.begin() as conn:
+            for statement in POSTGRES_DDL:
+                conn.exec_driver_sql(statement)
+        return False
+
+    return False
+
+
+def rebuild_search_index(engine):
+    """Повна перебудова індексу (після ручних змін у базі)"""
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            conn.exec_driver_sql('REINDEX INDEX ix_patients_full_name_trgm')
+            conn.exec_driver_sql('REINDEX INDEX ix_patients_history_number_prefix')
+
+
+def search_backend(engine):
+    """Повертає 'fts5', 'trgm' або 'like' для поточної бази"""
+    if engine.url in _available:
+        return _available[engine.url]
+
+    backend = 'like'
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            found = conn.execute(
+                db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+        if found:
+            backend = 'fts5'
+    elif engine.dialect.name == 'postgresql':
+        backend = 'trgm'
+
+    _available[engine.url] = backend
+    return backend
+
+
+def search_terms(text):
+    """Розбиває пошуковий рядок на слова"""
+    return [term for term in re.split(r'\s+', text.strip()) if term]
+
+
+def fts_match_expression(terms):
+    """
+    Вираз MATCH для FTS5: кожне слово - фраза з пошуком за префіксом,
+    слова об'єднуються через AND.
+    """
+    phrases = []
+    for term in terms:
+        phrases.append('"' + term.replace('"', '""') + '"*')
+    return ' '.join(phrases)
+
+
+def apply_search(query, text, ranked=True):
+    """
+    Додає до запиту пацієнтів пошук за ПІБ або № історії.
+    При ranked=True результати спочатку сортуються за релевантністю.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query
+
+    backend = search_backend(db.engine)
+
+    if backend == 'fts5':
+        fts = db.table(FTS_TABLE, db.column('rowid'))
+        fts_ref = db.literal_column(FTS_TABLE)
+        query = query.join(fts, fts.c.rowid == Patient.id).filter(
+            fts_ref.op('MATCH')(fts_match_expression(terms))
+        )
+        if ranked:
+            # bm25 повертає менше значення для кращого збігу; № історії важить більше
+            query = query.order_by(db.func.bm25(fts_ref, 1.0, 2.0))
+        return query
+
+    if backend == 'trgm':
+        name = db.func.lower(Patient.full_name)
+        number = db.func.lower(Patient.history_number)
+        for term in terms:
+            term = term.lower()
+            query = query.filter(db.or_(
+                name.like(f'%{term}%'),
+                number.like(f'{term}%')
+            ))
+        if ranked:
+            query = query.order_by(db.func.similarity(name, ' '.join(terms).lower()).desc())
+        return query
+
+    for term in terms:
+        query = query.filter(db.or_(
+            Patient.full_name.ilike(f'%{term}%'),
+            Patient.history_number.ilike(f'%{term}%')
+        ))
+    return query
@@ -0,0 +1,140 @@
+"""
+Вхід у систему з обмеженою вартістю.
+
+- Перевірка bcrypt виконується в невеликому пулі потоків
+  (LOGIN_HASH_WORKERS), тож хвиля входів на початку зміни займає не
+  більше цієї кількості ядер, а решта запитів обслуговується далі.
+  Якщо черга перевірок заповнена (LOGIN_HASH_QUEUE), вхід відхиляється
+  з LoginBusy замість очікування.
+- Спроби обмежуються «відром токенів» в пам'яті процесу окремо для
+  імені користувача та для IP-адреси.
+- Для неіснуючого користувача перевіряється фіктивний хеш тієї самої
+  вартості, тож за часом відповіді не видно, чи існує ім'я.
+- Якщо вартість хешу користувача відрізняється від BCRYPT_LOG_ROUNDS,
+  після успішного входу пароль перехешовується.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class LoginBusy(Exception):
+    """Пул перевірки паролів перевантажений"""
+
+
+class RateLimiter:
+    """Відра токенів за ключем: burst спроб одразу, далі per_minute за хвилину"""
+
+    def __init__(self, burst, per_minute, maxsize=10000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refill(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key):
+        """Секунди до наступної дозволеної спроби (0 - можна зараз), нічого не витрачає"""
+        with self._lock:
+            tokens = self._refill(key, time.monotonic())
+        return 0 if tokens >= 1 else math.ceil((1 - tokens) / self.rate)
+
+    def consume(self, key):
+        with self._lock:
+            now = time.monotonic()
+            self._buckets[key] = (self._refill(key, now) - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+
+
+def hash_cost(password_hash):
+    """Вартість (log rounds) з хешу виду $2b$12$..."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class LoginSecurity:
+    """Налаштовується з конфігурації в create_app"""
+
+    def __init__(self):
+        self.executor = None
+        self._dummy_hash = None
+
+    def init_app(self, app):
+        config = app.config
+        self.rounds = config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.timeout = config['LOGIN_HASH_TIMEOUT']
+        self.executor = ThreadPoolExecutor(max_workers=config['LOGIN_HASH_WORKERS'],
+                                           thread_name_prefix='bcrypt')
+        self.slots = threading.BoundedSemaphore(config['LOGIN_HASH_WORKERS'] + config['LOGIN_HASH_QUEUE'])
+        self.by_username = RateLimiter(config['LOGIN_USERNAME_BURST'], config['LOGIN_USERNAME_PER_MINUTE'])
+        self.by_ip = RateLimiter(config['LOGIN_IP_BURST'], config['LOGIN_IP_PER_MINUTE'])
+
+    @property
+    def dummy_hash(self):
+        # Рахується при першому вході, щоб не сповільнювати старт кожного процесу
+        if self._dummy_hash is None:
+            from app import bcrypt
+
+            self._dummy_hash = bcrypt.generate_password_hash('dummy-password').decode('utf-8')
+        return self._dummy_hash
+
+    def rate_limited(self, username, ip):
+        """
+        Секунди очікування, якщо ліміт спроб вичерпано, інакше 0.
+        Дозволена спроба витрачає токен з обох відер.
+        """
+        username_key = (username or '').strip().lower()
+        wait = max(self.by_username.retry_after(username_key), self.by_ip.retry_after(ip))
+        if wait:
+            return wait
+        self.by_username.consume(username_key)
+        self.by_ip.consume(ip)
+        return 0
+
+    def verify(self, user, password):
+        """Перевірка пароля в пулі потоків; для user=None - фіктивна перевірка"""
+        from app import bcrypt
+
+        password_hash = user.password_hash if user is not None else self.dummy_hash
+        valid = self._run(bcrypt.check_password_hash, password_hash, password)
+        return valid and user is not None
+
+    def _run(self, func, *args):
+        """Виконує func у пулі bcrypt і чекає результат"""
+        if not self.slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        # Слот звільняється, коли хешування справді завершиться, навіть після таймауту
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise LoginBusy()
+
+    def rehash_if_needed(self, user, password):
+        """Перехешування пароля після зміни BCRYPT_LOG_ROUNDS. Повертає True, якщо хеш оновлено"""
+        from app import db, bcrypt
+
+        if hash_cost(user.password_hash) == self.rounds:
+            return False
+        try:
+            password_hash = self._run(bcrypt.generate_password_hash, password)
+        except LoginBusy:
+            # Пул зайнятий - перехешуємо при наступному вході
+            return False
+        user.password_hash = password_hash.decode('utf-8')
+        db.session.commit()
+        return True
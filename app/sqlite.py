@@ -0,0 +1,85 @@
+"""
+Налаштування SQLite для роботи кількох користувачів одночасно.
+
+- При кожному з'єднанні виконуються PRAGMA з SQLITE_PRAGMAS. Журнал WAL
+  дозволяє читати базу під час запису, synchronous=NORMAL у режимі WAL
+  не втрачає цілісності, busy_timeout чекає блокування замість помилки
+  'database is locked'.
+- Список пацієнтів і експорт читають через окремий двигун тільки для
+  читання (mode=ro), тож читачі не конкурують із записом за з'єднання
+  основного пулу. read_session() повертає сесію цього двигуна або
+  звичайну db.session, якщо двигун вимкнено чи база не SQLite.
+"""
+from flask import current_app, g
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from flask_sqlalchemy.query import Query
+from app import db
+
+# PRAGMA, що діють на з'єднання (journal_mode зберігається у файлі бази)
+CONNECTION_PRAGMAS = ('synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def _set_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def apply_pragmas(engine, pragmas, readonly=False):
+    """Виконує PRAGMA на кожному новому з'єднанні двигуна"""
+    if not readonly and 'journal_mode' in pragmas:
+        # Перемикання журналу - запис у файл бази, достатньо одного разу
+        with engine.connect() as connection:
+            connection.exec_driver_sql(f'PRAGMA journal_mode={pragmas["journal_mode"]}')
+    per_connection = {name: value for name, value in pragmas.items() if name in CONNECTION_PRAGMAS}
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        _set_pragmas(dbapi_connection, per_connection)
+
+    # З'єднання, відкрите вище для journal_mode, вже лежить у пулі без PRAGMA
+    engine.dispose()
+
+
+def readonly_engine(engine, pragmas):
+    """Двигун тільки для читання для того самого файлу бази"""
+    url = engine.url.set(database=f'file:{engine.url.database}',
+                         query=dict(engine.url.query, mode='ro', uri='true'))
+    readonly = create_engine(url)
+    apply_pragmas(readonly, pragmas, readonly=True)
+    return readonly
+
+
+def init_sqlite(app):
+    """Налаштовує SQLite-базу застосунку; для інших баз нічого не робить"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    pragmas = app.config['SQLITE_PRAGMAS']
+    apply_pragmas(engine, pragmas)
+    if app.config['SQLITE_READONLY_ENGINE']:
+        app.extensions['readonly_engine'] = readonly_engine(engine, pragmas)
+        app.teardown_appcontext(_close_read_session)
+
+
+def read_session():
+    """Сесія для запитів, що лише читають (список, фасети, експорт)"""
+    engine = current_app.extensions.get('readonly_engine')
+    if engine is None:
+        return db.session
+    if 'read_session' not in g:
+        g.read_session = Session(bind=engine)
+    return g.read_session
+
+
+def read_query(*entities):
+    """Аналог Model.query / db.session.query через read_session()"""
+    return Query(entities, session=read_session())
+
+
+def _close_read_session(exception=None):
+    session = g.pop('read_session', None)
+    if session is not None:
+        session.close()
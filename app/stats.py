@@ -0,0 +1,145 @@
+"""
+Місячна статистика: поступлення, виписки, смерті та середній ліжко-день
+за відділеннями і лікарями.
+
+Агрегати зберігаються в таблиці monthly_stats. Після кожної зміни
+пацієнтів (маршрути, імпорт - через events.patients_changed) рядки
+зачеплених місяців перераховуються кількома запитами по індексах дат,
+тож дашборд і JSON-ендпоінт читають лише готові агрегати і не
+залежать від розміру таблиці пацієнтів. Пацієнти з архіву
+(app/archive.py) враховуються так само.
+"""
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Patient, ArchivedPatient, MonthlyStat
+from app.queries import filter_by_month, month_range
+from app.sqlite import read_query
+
+GROUPS = {'department': MonthlyStat.department, 'doctor': MonthlyStat.doctor}
+COUNTERS = ('admissions', 'discharges', 'deaths', 'stay_days')
+
+
+def _stay_days(model):
+    """Тривалість перебування в днях (залежить від бази)"""
+    if db.engine.dialect.name == 'sqlite':
+        return db.func.julianday(model.discharge_date) - db.func.julianday(model.admission_date)
+    return model.discharge_date - model.admission_date
+
+
+def _add_month(groups, model, year, month):
+    """Додає до groups агрегати місяця з таблиці model"""
+    keys = (model.department, model.doctor)
+
+    admissions = filter_by_month(db.session.query(*keys, db.func.count(model.id)), year, month,
+                                 column=model.admission_date)
+    for department, doctor, count in admissions.group_by(*keys):
+        groups[department, doctor]['admissions'] += count
+
+    discharges = filter_by_month(
+        db.session.query(*keys, db.func.count(model.id), db.func.sum(_stay_days(model))),
+        year, month, column=model.discharge_date
+    )
+    for department, doctor, count, stay_days in discharges.group_by(*keys):
+        groups[department, doctor]['discharges'] += count
+        groups[department, doctor]['stay_days'] += int(stay_days or 0)
+
+    # Дата смерті, а якщо її не вказано - дата виписки (обидві умови по індексах)
+    start, end = month_range(year, month)
+    deaths = db.session.query(*keys, db.func.count(model.id)).filter(
+        model.is_deceased == True,
+        db.or_(
+            db.and_(model.death_date >= start, model.death_date < end),
+            db.and_(model.death_date.is_(None),
+                    model.discharge_date >= start, model.discharge_date < end),
+        )
+    )
+    for department, doctor, count in deaths.group_by(*keys):
+        groups[department, doctor]['deaths'] += count
+
+
+def compute_month(year, month):
+    """
+    Агрегати місяця з таблиці пацієнтів разом з архівом:
+    {(відділення, лікар): {лічильник: значення}}
+    """
+    groups = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for model in (Patient, ArchivedPatient):
+        _add_month(groups, model, year, month)
+    return groups
+
+
+def refresh_month(year, month):
+    """Перераховує і зберігає рядки monthly_stats одного місяця"""
+    groups = compute_month(year, month)
+    MonthlyStat.query.filter_by(year=year, month=month).delete()
+    if groups:
+        db.session.execute(MonthlyStat.__table__.insert(), [
+            dict(counters, year=year, month=month, department=department, doctor=doctor)
+            for (department, doctor), counters in groups.items()
+        ])
+    db.session.commit()
+
+
+def refresh_months(months):
+    """Оновлення агрегатів після зміни пацієнтів; помилка не скасовує саму зміну"""
+    for year, month in sorted(months):
+        for attempt in range(2):
+            try:
+                refresh_month(year, month)
+                break
+            except IntegrityError:
+                # Той самий місяць одночасно перераховував інший запит - повторюємо
+                db.session.rollback()
+                if attempt:
+                    current_app.logger.exception('Не вдалося оновити статистику за %s-%02d', year, month)
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception('Не вдалося оновити статистику за %s-%02d', year, month)
+                break
+
+
+def rebuild_all():
+    """Повний перерахунок статистики за всі місяці з даними. Повертає кількість місяців"""
+    months = set()
+    for model in (Patient, ArchivedPatient):
+        for column in (model.admission_date, model.discharge_date, model.death_date):
+            values = db.session.query(column).filter(column.isnot(None)).distinct()
+            months.update((value.year, value.month) for (value,) in values)
+    MonthlyStat.query.delete()
+    db.session.commit()
+    for year, month in sorted(months):
+        refresh_month(year, month)
+    return len(months)
+
+
+def _row(name, values):
+    admissions, discharges, deaths, stay_days = (int(value or 0) for value in values)
+    return {
+        'name': name,
+        'admissions': admissions,
+        'discharges': discharges,
+        'deaths': deaths,
+        'avg_stay': round(stay_days / discharges, 1) if discharges else None,
+    }
+
+
+def _sums():
+    return [db.func.sum(getattr(MonthlyStat, counter)) for counter in COUNTERS]
+
+
+def month_stats(year, month, group='department'):
+    """Рядки за відділеннями або лікарями та підсумок місяця"""
+    column = GROUPS[group]
+    query = read_query(column, *_sums()).filter(MonthlyStat.year == year, MonthlyStat.month == month)
+    rows = [_row(name, values) for name, *values in query.group_by(column).order_by(column)]
+    total = read_query(*_sums()).filter(MonthlyStat.year == year, MonthlyStat.month == month).one()
+    return {'rows': rows, 'total': _row('Всього', total)}
+
+
+def year_stats(year):
+    """Підсумки по місяцях року"""
+    query = read_query(MonthlyStat.month, *_sums()).filter(MonthlyStat.year == year)
+    by_month = {month: values for month, *values in query.group_by(MonthlyStat.month)}
+    return [_row(month, by_month.get(month, (0, 0, 0, 0))) for month in range(1, 13)]
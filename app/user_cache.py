@@ -0,0 +1,64 @@
+"""
+Кеш автентифікованих користувачів для load_user.
+
+Flask-Login завантажує користувача на кожному запиті. Замість запиту до
+бази береться знімок (CachedUser) з LRU-кешу процесу з коротким TTL.
+Зміни ролі, імені чи видалення в адмінці скидають запис одразу
+(invalidate); інші воркери побачать зміну після закінчення TTL.
+"""
+from flask_login import UserMixin
+from app.cache import MemoryCache
+
+
+class CachedUser(UserMixin):
+    """Незмінний знімок користувача з полями, потрібними на кожному запиті"""
+
+    __slots__ = ('id', 'username', 'role')
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role)
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class UserCache:
+    """Налаштовується з конфігурації в create_app (USER_CACHE_SIZE, USER_CACHE_TTL)"""
+
+    def __init__(self):
+        self.backend = MemoryCache()
+
+    def init_app(self, app):
+        self.backend = MemoryCache(maxsize=app.config['USER_CACHE_SIZE'],
+                                   default_timeout=app.config['USER_CACHE_TTL'])
+
+    def load(self, user_id):
+        """Знімок користувача з кешу або з бази; None, якщо користувача немає"""
+        cached = self.backend.get(user_id)
+        if cached is not None:
+            return cached
+        from app.models import User
+
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        cached = CachedUser.from_user(user)
+        self.backend.set(user_id, cached)
+        return cached
+
+    def invalidate(self, user_id):
+        self.backend.delete(user_id)
+
+    def stats(self):
+        stats = self.backend.stats()
+        del stats['backend']
+        return stats
@@ -0,0 +1,11 @@
+"""
+Бенчмарки застосунку.
+
+- generator.py - детермінований генератор пацієнтів і користувачів;
+- measure.py - перцентилі, медіана, пік пам'яті;
+- suite.py - набір сценаріїв (список, пошук, фільтр, глибока сторінка,
+  API, експорт, імпорт) для 10k/100k/1M рядків на SQLite і PostgreSQL;
+- startup.py - час старту воркера, RSS і зведення python -X importtime;
+- bench_*.py - вузькі порівняння окремих оптимізацій;
+- loadtest.py - навантаження на запущений сервер по HTTP.
+"""
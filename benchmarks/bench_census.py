@@ -0,0 +1,109 @@
+"""
+Бенчмарк щоденної зайнятості ліжок (app/census.py).
+
+Порівнює «лінію розгортки» NumPy з наївним підрахунком - окремий
+COUNT на кожен день і відділення - за місяць і за весь період даних
+(наївний варіант за роки оцінюється з вибірки днів).
+
+Запуск (з кореня проєкту):
+    python benchmarks/bench_census.py --rows 1000000 --years 5
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import fill  # noqa: E402
+from benchmarks.measure import timed  # noqa: E402
+
+
+def naive_day(db, Patient, day, department):
+    """Кількість пацієнтів відділення у стаціонарі на день day"""
+    return Patient.query.filter(
+        Patient.department == department,
+        Patient.admission_date <= day,
+        db.or_(Patient.discharge_date > day,
+               db.and_(Patient.discharge_date.is_(None),
+                       db.or_(Patient.is_deceased == False, Patient.death_date.is_(None),
+                              Patient.death_date > day)))
+    ).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sample-days', type=int, default=5)
+    args = parser.parse_args()
+
+    from config import Config
+    from app import create_app, db, cache
+    from app.models import Patient
+    from app.census import compute_census, month_census
+    from app.queries import month_range
+
+    workdir = tempfile.mkdtemp(prefix='bench_census_')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        JOBS_STORAGE_DIR = os.path.join(workdir, 'exports')
+        JOBS_DATABASE = os.path.join(workdir, 'exports', 'jobs.db')
+
+    app = create_app(BenchConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            fill(db, Patient, args.rows, years=args.years)
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+            print(f'{args.rows} рядків за {args.years} р. вставлено за {time.perf_counter() - started:.1f} с')
+
+            today = date.today()
+            month_start, month_end = month_range(today.year - 1, today.month)
+            period_start = today.replace(day=1) - timedelta(days=365 * args.years)
+            period_end = today.replace(day=1)
+            departments = compute_census(month_start, month_end).departments
+
+            # Наївний варіант: COUNT на кожен день і відділення
+            sample = [month_start + timedelta(days=i) for i in range(args.sample_days)]
+            started = time.perf_counter()
+            for day in sample:
+                for department in departments:
+                    naive_day(db, Patient, day, department)
+            per_day = (time.perf_counter() - started) * 1000 / len(sample)
+            month_days = (month_end - month_start).days
+            period_days = (period_end - period_start).days
+
+            sweep_month = timed(lambda: compute_census(month_start, month_end), args.repeat)
+            sweep_period = timed(lambda: compute_census(period_start, period_end), args.repeat)
+
+            cache.clear()
+            month_census(month_start.year, month_start.month)
+            cached = timed(lambda: month_census(month_start.year, month_start.month), args.repeat)
+
+            # Перевірка: обидва способи дають однакові числа
+            census = compute_census(month_start, month_end)
+            for i, day in enumerate(sample):
+                for row, department in zip(census.counts, census.departments):
+                    assert row[i] == naive_day(db, Patient, day, department), (day, department)
+
+            print(f'{"варіант":<34}{"місяць, мс":>14}{f"{args.years} р., мс":>14}')
+            print(f'{"COUNT на день × відділення":<34}{per_day * month_days:>14.0f}'
+                  f'{per_day * period_days:>14.0f}  (оцінка з {len(sample)} днів)')
+            print(f'{"лінія розгортки NumPy":<34}{sweep_month:>14.1f}{sweep_period:>14.1f}')
+            print(f'{"місяць з кешу":<34}{cached:>14.2f}')
+            db.session.remove()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
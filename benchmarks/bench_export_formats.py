@@ -0,0 +1,59 @@
+"""
+Бенчмарк форматів експорту: час створення та розмір файлу.
+
+Усі формати використовують один конвеєр читання рядків
+(app.exporters.iter_patient_records), тому різниця - лише у записі.
+
+Запуск (з кореня проєкту):
+    python benchmarks/bench_export_formats.py --rows 100000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import fill  # noqa: E402
+
+
+def run(rows):
+    workdir = tempfile.mkdtemp(prefix='bench_export_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from app import create_app, db
+    from app.models import Patient
+    from app.exporters import EXPORT_COLUMNS, EXPORT_FORMATS, write_export, stream_export
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        fill(db, Patient, rows)
+        query = Patient.query.with_entities(*EXPORT_COLUMNS).order_by(Patient.admission_date.desc(), Patient.id.desc())
+
+        print(f'\n{rows} рядків')
+        print(f'{"формат":<10}{"час, с":>10}{"розмір, МБ":>14}')
+        for file_format, (extension, _, streamed) in EXPORT_FORMATS.items():
+            path = os.path.join(workdir, 'export' + extension)
+            started = time.perf_counter()
+            if streamed:
+                with open(path, 'wb') as output:
+                    for chunk in stream_export(file_format, query):
+                        output.write(chunk)
+            else:
+                write_export(file_format, query, path)
+            elapsed = time.perf_counter() - started
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f'{file_format:<10}{elapsed:>10.2f}{size:>14.2f}')
+        db.session.remove()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,84 @@
+"""
+Бенчмарк фільтра списку пацієнтів за місяць.
+
+Порівнює старий фільтр через extract(month/year) з діапазоном дат
+[перше число місяця, перше число наступного), який використовує
+складений індекс ix_patients_admission_filters.
+
+Запуск (з кореня проєкту):
+    python benchmarks/bench_month_filter.py --rows 100000 1000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import fill  # noqa: E402
+from benchmarks.measure import timed  # noqa: E402
+
+
+def run(rows, repeat):
+    workdir = tempfile.mkdtemp(prefix='bench_month_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from app import create_app, db
+    from app.models import Patient
+    from app.queries import filter_by_month, filter_patients
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        fill(db, Patient, rows)
+        db.session.execute(db.text('ANALYZE'))
+        print(f'\n{rows} рядків, заповнення {time.perf_counter() - started:.1f} c')
+
+        today = date.today()
+
+        def old_query(**filters):
+            query = Patient.query.filter(
+                db.extract('month', Patient.admission_date) == today.month,
+                db.extract('year', Patient.admission_date) == today.year
+            )
+            return filter_patients(query, **filters).order_by(Patient.admission_date.desc())
+
+        def new_query(**filters):
+            query = filter_by_month(Patient.query, today.year, today.month)
+            return filter_patients(query, **filters).order_by(Patient.admission_date.desc())
+
+        def listing(build, **filters):
+            return lambda: build(**filters).paginate(page=1, per_page=50, error_out=False).items
+
+        scenarios = [
+            ('список', {}),
+            ('відділення', {'department': 'Терапія'}),
+            ('статус', {'status': 'deceased'}),
+        ]
+        print(f'{"сценарій":<14}{"extract, мс":>14}{"діапазон, мс":>16}{"прискорення":>14}')
+        for name, filters in scenarios:
+            old_ms = timed(listing(old_query, **filters), repeat)
+            new_ms = timed(listing(new_query, **filters), repeat)
+            print(f'{name:<14}{old_ms:>14.2f}{new_ms:>16.2f}{old_ms / new_ms:>13.1f}x')
+        db.session.remove()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    # Кожен розмір запускаємо в окремому процесі, щоб не змішувати конфігурацію
+    if len(args.rows) > 1:
+        import subprocess
+        for rows in args.rows:
+            subprocess.run([sys.executable, __file__, '--rows', str(rows),
+                            '--repeat', str(args.repeat)], check=True)
+    else:
+        run(args.rows[0], args.repeat)
@@ -0,0 +1,134 @@
+"""
+Бенчмарк читання списку пацієнтів під час запису в SQLite.
+
+Кілька потоків читають сторінку списку за поточний місяць (як
+patients.index), а один потік безперервно оновлює пацієнтів порціями
+(як редагування та імпорт). Порівнюються налаштування SQLite за
+замовчуванням (журнал відкату, одне з'єднання на всіх) і профіль з
+app/sqlite.py (WAL, PRAGMA, окремий двигун тільки для читання).
+
+Запуск (з кореня проєкту):
+    python benchmarks/bench_sqlite_concurrency.py --rows 200000 --seconds 10
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import fill  # noqa: E402
+from benchmarks.measure import percentile  # noqa: E402
+
+
+def run(mode, rows, seconds, readers, write_batch):
+    from config import Config
+    from app import create_app, db
+    from app.models import Patient
+    from app.queries import filter_by_month
+    from app.sqlite import read_query
+
+    workdir = tempfile.mkdtemp(prefix='bench_sqlite_')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        JOBS_STORAGE_DIR = os.path.join(workdir, 'exports')
+        JOBS_DATABASE = os.path.join(workdir, 'exports', 'jobs.db')
+        if mode == 'default':
+            SQLITE_PRAGMAS = {}
+            SQLITE_READONLY_ENGINE = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        fill(db, Patient, rows)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        journal = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        db.session.remove()
+
+    today = date.today()
+    stop = threading.Event()
+    latencies = []
+    errors = []
+    writes = [0]
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            with app.app_context():
+                started = time.perf_counter()
+                try:
+                    query = filter_by_month(read_query(Patient), today.year, today.month)
+                    query.order_by(Patient.admission_date.desc(), Patient.id.desc()).limit(50).all()
+                    query.order_by(None).count()
+                except Exception as e:
+                    with lock:
+                        errors.append(type(e).__name__)
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    def writer():
+        rnd = random.Random(1)
+        table = Patient.__table__
+        while not stop.is_set():
+            with app.app_context():
+                ids = [rnd.randint(1, rows) for _ in range(write_batch)]
+                try:
+                    db.session.execute(
+                        table.update().where(table.c.id == db.bindparam('pid')).values(comment=db.bindparam('text')),
+                        [{'pid': pid, 'text': f'оновлено {time.time()}'} for pid in ids]
+                    )
+                    db.session.commit()
+                    writes[0] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(type(e).__name__)
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f'{mode:<9}{journal:<8}{len(latencies) / seconds:>10.0f}'
+          f'{statistics.median(latencies) if latencies else 0:>10.1f}'
+          f'{percentile(latencies, 95):>10.1f}{percentile(latencies, 99):>10.1f}'
+          f'{max(latencies, default=0):>10.1f}{writes[0]:>9}{len(errors):>9}')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--write-batch', type=int, default=2000)
+    parser.add_argument('--mode', choices=['default', 'tuned'])
+    args = parser.parse_args()
+    if args.mode:
+        run(args.mode, args.rows, args.seconds, args.readers, args.write_batch)
+    else:
+        print(f'{args.rows} рядків, {args.readers} читачі, запис порціями по {args.write_batch}')
+        print(f'{"режим":<9}{"журнал":<8}{"читань/с":>10}{"p50, мс":>10}{"p95, мс":>10}'
+              f'{"p99, мс":>10}{"max, мс":>10}{"записів":>9}{"помилок":>9}')
+        # Кожен режим в окремому процесі, щоб не змішувати конфігурацію
+        import subprocess
+        for mode in ('default', 'tuned'):
+            subprocess.run([sys.executable, __file__, '--mode', mode, '--rows', str(args.rows),
+                            '--seconds', str(args.seconds), '--readers', str(args.readers),
+                            '--write-batch', str(args.write_batch)], check=True)
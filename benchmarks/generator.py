@@ -0,0 +1,170 @@
+"""
+Детермінований генератор синтетичних даних для бенчмарків.
+
+Однаковий seed дає однакові дані, тож результати різних запусків і
+гілок можна порівнювати. Дані наближені до реальних:
+- українські ПІБ (чоловічі та жіночі форми, по батькові);
+- відділення з різною часткою поступлень, власним переліком лікарів,
+  тривалістю перебування та летальністю;
+- сезонність (більше поступлень узимку) за кілька років;
+- пацієнти останніх днів частково ще лікуються (без дати виписки).
+
+Вставка - пакетами через Core (executemany), без ORM-об'єктів.
+"""
+import math
+import random
+from datetime import date, timedelta
+
+# Прізвища, однакові для чоловіків і жінок
+SURNAMES = [
+    'Коваленко', 'Бондаренко', 'Шевченко', 'Ткаченко', 'Кравченко', 'Олійник',
+    'Шевчук', 'Поліщук', 'Бойко', 'Мельник', 'Ткачук', 'Марченко', 'Савченко',
+    'Руденко', 'Мороз', 'Лисенко', 'Петренко', 'Клименко', 'Павленко', 'Кузьменко',
+    'Левченко', 'Гончаренко', 'Романенко', 'Захарченко', 'Литвиненко',
+    'Гнатюк', 'Сидоренко', 'Дорошенко', 'Білоус', 'Пономаренко',
+]
+# (чоловіча форма, жіноча форма)
+GENDERED_SURNAMES = [
+    ('Ковальський', 'Ковальська'), ('Савицький', 'Савицька'), ('Вишневський', 'Вишневська'),
+    ('Заїчний', 'Заїчна'), ('Яворський', 'Яворська'), ('Левицький', 'Левицька'),
+]
+MALE_NAMES = ['Олександр', 'Андрій', 'Сергій', 'Володимир', 'Микола', 'Іван', 'Дмитро',
+              'Юрій', 'Василь', 'Петро', 'Олег', 'Віктор', 'Богдан', 'Тарас', 'Ярослав']
+FEMALE_NAMES = ['Олена', 'Наталія', 'Тетяна', 'Ірина', 'Оксана', 'Світлана', 'Марія',
+                'Людмила', 'Галина', 'Ганна', 'Юлія', 'Катерина', 'Мар\'яна', 'Софія', 'Надія']
+# Чоловіче ім'я батька -> (по батькові для чоловіка, для жінки)
+PATRONYMICS = {
+    'Олександр': ('Олександрович', 'Олександрівна'), 'Андрій': ('Андрійович', 'Андріївна'),
+    'Сергій': ('Сергійович', 'Сергіївна'), 'Володимир': ('Володимирович', 'Володимирівна'),
+    'Микола': ('Миколайович', 'Миколаївна'), 'Іван': ('Іванович', 'Іванівна'),
+    'Дмитро': ('Дмитрович', 'Дмитрівна'), 'Юрій': ('Юрійович', 'Юріївна'),
+    'Василь': ('Васильович', 'Василівна'), 'Петро': ('Петрович', 'Петрівна'),
+    'Олег': ('Олегович', 'Олегівна'), 'Віктор': ('Вікторович', 'Вікторівна'),
+    'Богдан': ('Богданович', 'Богданівна'), 'Тарас': ('Тарасович', 'Тарасівна'),
+    'Ярослав': ('Ярославович', 'Ярославівна'),
+}
+
+# відділення: (частка поступлень, медіана перебування в днях, летальність)
+DEPARTMENTS = {
+    'Терапія': (0.22, 8, 0.015),
+    'Хірургія': (0.18, 6, 0.01),
+    'Кардіологія': (0.14, 9, 0.03),
+    'Неврологія': (0.12, 11, 0.025),
+    'Педіатрія': (0.10, 5, 0.001),
+    'Травматологія': (0.10, 10, 0.005),
+    'Гінекологія': (0.09, 4, 0.001),
+    'Реанімація': (0.05, 4, 0.15),
+}
+DOCTORS_PER_DEPARTMENT = 5
+COMMENTS = ['Повторна госпіталізація', 'Переведений з іншого відділення',
+            'Планова операція', 'Алергія на пеніцилін', 'Потребує консультації кардіолога']
+
+
+def full_name(rnd):
+    """Випадкове ПІБ у форматі «Прізвище Ім'я По батькові»"""
+    female = rnd.random() < 0.52
+    if rnd.random() < 0.7:
+        surname = rnd.choice(SURNAMES)
+    else:
+        surname = rnd.choice(GENDERED_SURNAMES)[1 if female else 0]
+    name = rnd.choice(FEMALE_NAMES if female else MALE_NAMES)
+    patronymic = PATRONYMICS[rnd.choice(MALE_NAMES)][1 if female else 0]
+    return f'{surname} {name} {patronymic}'
+
+
+def doctors(seed=7):
+    """Лікарі кожного відділення: {відділення: [«Прізвище І.П.»]}"""
+    rnd = random.Random(seed)
+    result = {}
+    for department in DEPARTMENTS:
+        result[department] = []
+        for _ in range(DOCTORS_PER_DEPARTMENT):
+            surname, name, patronymic = full_name(rnd).split(' ')
+            result[department].append(f'{surname} {name[0]}.{patronymic[0]}.')
+    return result
+
+
+def _admission_day(rnd, start, span):
+    """День поступлення з сезонністю: узимку приблизно на 30% більше, ніж улітку"""
+    while True:
+        day = start + timedelta(days=rnd.randrange(span))
+        weight = 1 + 0.3 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365)
+        if rnd.random() * 1.3 <= weight:
+            return day
+
+
+def generate_patients(rows, years=5, seed=42, end=None, created_by=(1,), prefix=''):
+    """
+    Словники полів Patient для вставки. Поступлення розподілені за years
+    років до end (за замовчуванням - кінець поточного місяця).
+    """
+    rnd = random.Random(seed)
+    today = date.today()
+    if end is None:
+        end = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    start = end - timedelta(days=365 * years)
+    span = (end - start).days
+    names = list(DEPARTMENTS)
+    weights = [share for share, _, _ in DEPARTMENTS.values()]
+    staff = doctors()
+
+    for i in range(rows):
+        department = rnd.choices(names, weights)[0]
+        _, median_stay, mortality = DEPARTMENTS[department]
+        admission = _admission_day(rnd, start, span)
+        stay = max(1, int(rnd.lognormvariate(math.log(median_stay), 0.5)))
+        discharge = admission + timedelta(days=stay)
+        deceased = rnd.random() < mortality
+        death_date = discharge if deceased else None
+        if discharge > today:
+            # Ще лікується
+            discharge = None
+            deceased, death_date = False, None
+        elif deceased and rnd.random() < 0.3:
+            # Частина померлих без дати виписки
+            discharge = None
+        yield {
+            'admission_date': admission,
+            'discharge_date': discharge,
+            'full_name': full_name(rnd),
+            'department': department,
+            'doctor': rnd.choice(staff[department]),
+            'history_number': f'{prefix}{admission.year}/{i:07d}',
+            'comment': rnd.choice(COMMENTS) if rnd.random() < 0.1 else None,
+            'is_deceased': deceased,
+            'death_date': death_date,
+            'created_by': rnd.choice(created_by),
+        }
+
+
+def fill_users(db, User, count=10, password='bench-password'):
+    """Адміністратор bench-admin і count-1 користувачів. Повертає їхні id"""
+    from app import bcrypt
+
+    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+    existing = {user.username: user.id for user in User.query.all()}
+    for i in range(count):
+        username = 'bench-admin' if i == 0 else f'bench-user-{i}'
+        if username not in existing:
+            db.session.add(User(username=username, password_hash=password_hash,
+                                role='admin' if i == 0 else 'user'))
+    db.session.commit()
+    return [user.id for user in User.query.filter(User.username.like('bench-%')).order_by(User.id)]
+
+
+def fill(db, Patient, rows, years=5, batch=50000, seed=42):
+    """Масова вставка rows пацієнтів (разом із користувачами-авторами)"""
+    from app.models import User
+
+    user_ids = fill_users(db, User)
+    table = Patient.__table__
+    chunk = []
+    for record in generate_patients(rows, years=years, seed=seed, created_by=user_ids):
+        chunk.append(record)
+        if len(chunk) == batch:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
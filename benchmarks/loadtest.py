@@ -0,0 +1,105 @@
+"""
+Навантажувальний тест списку пацієнтів.
+
+Кожен клієнт входить у систему власною сесією і протягом заданого часу
+запитує сторінки списку (з фільтрами та без). Показує пропускну
+здатність і затримки - для порівняння dev-сервера з gunicorn:
+
+    python run.py                                   # dev-сервер
+    gunicorn -c gunicorn.conf.py wsgi:app           # production
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --clients 20 --seconds 30
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.measure import percentile  # noqa: E402
+
+PATHS = [
+    '/',
+    '/?status=alive',
+    '/?department=Терапія',
+    '/?search=пацієнт',
+]
+
+
+
+def login(base_url, username, password):
+    """Відкривач urllib з cookie сесії користувача"""
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+    )
+    page = opener.open(base_url + '/login').read().decode('utf-8')
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+    data = {'username': username, 'password': password}
+    if token:
+        data['csrf_token'] = token.group(1)
+    response = opener.open(base_url + '/login', urllib.parse.urlencode(data).encode('utf-8'))
+    if response.geturl().rstrip('/').endswith('/login'):
+        raise SystemExit('Не вдалося увійти: перевірте --username/--password')
+    return opener
+
+
+def client(base_url, opener, deadline, latencies, errors, lock, seed):
+    rnd = random.Random(seed)
+    while time.perf_counter() < deadline:
+        path = urllib.parse.quote(rnd.choice(PATHS), safe='/?=&')
+        started = time.perf_counter()
+        try:
+            with opener.open(base_url + path, timeout=60) as response:
+                response.read()
+        except (urllib.error.URLError, OSError) as e:
+            with lock:
+                errors.append(str(e))
+            continue
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--seconds', type=int, default=20)
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    openers = [login(base_url, args.username, args.password) for _ in range(args.clients)]
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=client, args=(base_url, opener, deadline, latencies, errors, lock, i))
+        for i, opener in enumerate(openers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f'{base_url}: {args.clients} клієнтів, {args.seconds} с')
+    print(f'запитів: {len(latencies)}, помилок: {len(errors)}')
+    print(f'пропускна здатність: {len(latencies) / args.seconds:.1f} запитів/с')
+    if latencies:
+        print(f'затримка, мс: p50 {statistics.median(latencies):.0f}, '
+              f'p95 {percentile(latencies, 95):.0f}, p99 {percentile(latencies, 99):.0f}, '
+              f'max {max(latencies):.0f}')
+
+
+if __name__ == '__main__':
+    main()
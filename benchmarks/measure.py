@@ -0,0 +1,44 @@
+"""Спільні вимірювання для бенчмарків: медіана, перцентилі, пік пам'яті"""
+import statistics
+import time
+import tracemalloc
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def timed(fn, repeat):
+    """Медіана часу виконання fn, мс"""
+    return statistics.median(samples(fn, repeat))
+
+
+def samples(fn, repeat, setup=None):
+    """Час кожного з repeat запусків fn, мс; setup виконується перед запуском поза заміром"""
+    result = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        result.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def peak_memory(fn, setup=None):
+    """
+    Пік виділеної Python пам'яті під час одного запуску fn, МБ.
+    tracemalloc сповільнює код, тому цей запуск не входить у заміри часу.
+    """
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
@@ -0,0 +1,117 @@
+"""
+Старт воркера: час імпорту застосунку, пам'ять і найдовші імпорти.
+
+Кожен замір - новий процес Python, що імпортує точку входу так само, як
+воркер gunicorn (wsgi:app, тобто create_app()). Показуються медіана часу,
+RSS процесу після старту і важкі бібліотеки, що завантажились одразу
+(pandas, NumPy, XlsxWriter, pyarrow мають підвантажуватись лише під час
+першого імпорту, експорту чи розрахунку зайнятості).
+
+--importtime додає зведення `python -X importtime`: пакети з найбільшим
+власним часом імпорту і модулі з найбільшим сумарним.
+
+Запуск (з кореня проєкту):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --importtime --top 15
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.measure import percentile  # noqa: E402
+
+HEAVY = ('pandas', 'numpy', 'xlsxwriter', 'pyarrow', 'openpyxl', 'redis')
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    # macOS: пікове значення в байтах
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+print(json.dumps({{'seconds': seconds, 'rss_mb': rss_kb / 1024,
+                  'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def probe_env(workdir):
+    """Окрема база і каталог завдань, щоб замір не торкався робочих даних"""
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+    env['JOBS_STORAGE_DIR'] = os.path.join(workdir, 'exports')
+    return env
+
+
+def measure(module, runs, env):
+    """Заміри в окремих процесах; перший (прогрів, компіляція .pyc) відкидається"""
+    code = PROBE.format(module=module, heavy=HEAVY)
+    results = []
+    for _ in range(runs + 1):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results[1:]
+
+
+def importtime(module, env):
+    """Рядки `python -X importtime`: (власний час, сумарний час, модуль), мкс"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), name.strip()))
+    return rows
+
+
+def print_importtime(rows, top):
+    by_package = defaultdict(int)
+    for own, _, name in rows:
+        by_package[name.split('.')[0]] += own
+    total = sum(by_package.values())
+    print(f'\nімпорт усього: {total / 1000:.0f} мс, модулів: {len(rows)}')
+    print(f'{"пакет":<28}{"власний час, мс":>18}')
+    for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f'{package:<28}{own / 1000:>18.1f}')
+    print(f'\n{"модуль":<48}{"сумарно, мс":>14}')
+    for _, cumulative, name in sorted(rows, key=lambda row: -row[1])[:top]:
+        print(f'{name[:47]:<48}{cumulative / 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='wsgi', help='точка входу, що імпортується')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--importtime', action='store_true', help='зведення python -X importtime')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        env = probe_env(workdir)
+        results = measure(args.module, args.runs, env)
+        seconds = [result['seconds'] * 1000 for result in results]
+        rss = [result['rss_mb'] for result in results]
+        print(f'import {args.module}, запусків: {args.runs}')
+        print(f'час старту: p50 {percentile(seconds, 50):.0f} мс, p95 {percentile(seconds, 95):.0f} мс')
+        print(f'RSS після старту: {percentile(rss, 50):.1f} МБ')
+        print(f'важкі бібліотеки при старті: {", ".join(results[-1]["heavy"]) or "немає"}')
+        if args.importtime:
+            print_importtime(importtime(args.module, env), args.top)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
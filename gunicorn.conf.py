@@ -0,0 +1,42 @@
+"""
+Налаштування gunicorn (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Воркери gthread: кілька процесів, у кожному пул потоків, тож повільний
+експорт чи пошук займає один потік, а не весь сервер. Кількість
+процесів за замовчуванням залежить від кількості ядер, якщо кеш спільний
+(CACHE_TYPE=redis). З кешем у пам'яті процесу за замовчуванням працює
+один процес з більшим пулом потоків, інакше кожен воркер бачив би власні
+застарілі сторінки й лічильники. Усе можна перевизначити змінними
+середовища.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = 'gthread'
+shared_cache = os.environ.get('CACHE_TYPE', 'memory') == 'redis'
+workers = int(os.environ.get('GUNICORN_WORKERS') or (multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1))
+threads = int(os.environ.get('GUNICORN_THREADS') or (4 if shared_cache else 8))
+
+# Синхронне завантаження великого експорту може тривати довго
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # Воркери успадковують оточення майстра: застосунок вмикає кеш сторінок
+    # і 304 лише при одному процесі або спільному кеші (app/http_cache.py).
+    # Тут уже врахований і -w з командного рядка
+    os.environ['WEB_PROCESSES'] = str(server.cfg.workers)
+    # Кеш у пам'яті окремий у кожному процесі: зміни з одного воркера
+    # інші побачать лише після закінчення терміну кешу. За замовчуванням
+    # такого не буває, лише при явно заданому GUNICORN_WORKERS
+    if server.cfg.workers > 1 and not shared_cache:
+        server.log.warning('CACHE_TYPE=memory при %d воркерах: фільтри та лічильники '
+                           'можуть відставати; для кількох воркерів використовуйте CACHE_TYPE=redis',
+                           server.cfg.workers)
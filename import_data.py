@@ -1,7 +1,6 @@
-import pandas as pd
-from datetime import datetime
-from app import create_app, db
-from app.models import Patient, User
+from app import create_app
+from app.models import User
+from app.importer import read_patients_file, import_patients
 
 def import_patients_from_excel(excel_file_path, created_by_username='admin'):
     """
@@ -10,6 +9,9 @@ def import_patients_from_excel(excel_file_path, created_by_username='admin'):
     Args:
         excel_file_path: шлях до Excel файлу
         created_by_username: ім'я користувача, який створює записи (за замовчуванням 'admin')
+    
+    Returns:
+        ImportResult зі звітом або None, якщо імпорт не виконано
     """
     app = create_app()
     
@@ -24,91 +26,39 @@ def import_patients_from_excel(excel_file_path, created_by_username='admin'):
         try:
             # Читання Excel файлу
             print(f"📂 Читання файлу: {excel_file_path}")
-            df = pd.read_excel(excel_file_path)
-            
-            # Виведення назв колонок для перевірки
+            df = read_patients_file(excel_file_path)
             print(f"📋 Знайдені колонки: {list(df.columns)}")
-            
-            # Очищення назв колонок (видалення пробілів)
-            df.columns = df.columns.str.strip()
-            
-            # Підрахунок
-            total = len(df)
-            success = 0
-            errors = 0
-            skipped = 0
-            
-            print(f"\n📊 Знайдено {total} записів у файлі")
+            print(f"\n📊 Знайдено {len(df)} записів у файлі")
             print("⏳ Починаю імпорт...\n")
             
-            for index, row in df.iterrows():
-                try:
-                    # Перевірка обов'язкових полів
-                    if pd.isna(row['ПІБ']) or pd.isna(row['№ Історії']):
-                        print(f"⚠️  Рядок {index + 2}: Пропущено (відсутні ПІБ або № Історії)")
-                        skipped += 1
-                        continue
-                    
-                    # Перевірка чи існує пацієнт з таким номером історії
-                    existing = Patient.query.filter_by(history_number=str(row['№ Історії']).strip()).first()
-                    if existing:
-                        print(f"⚠️  Рядок {index + 2}: Пропущено (№ Історії {row['№ Історії']} вже існує)")
-                        skipped += 1
-                        continue
-                    
-                    # Обробка дати виписки
-                    discharge_date = None
-                    if not pd.isna(row['ДАТА']):
-                        if isinstance(row['ДАТА'], datetime):
-                            discharge_date = row['ДАТА'].date()
-                        elif isinstance(row['ДАТА'], str):
-                            try:
-                                discharge_date = datetime.strptime(row['ДАТА'], '%d.%m.%Y').date()
-                            except ValueError:
-                                try:
-                                    discharge_date = datetime.strptime(row['ДАТА'], '%Y-%m-%d').date()
-                                except ValueError:
-                                    print(f"⚠️  Рядок {index + 2}: Неправильний формат дати '{row['ДАТА']}'")
-                    
-                    # Створення запису пацієнта
-                    patient = Patient(
-                        admission_date=discharge_date or datetime.now().date(),  # Якщо немає дати виписки, ставимо поточну
-                        discharge_date=discharge_date,
-                        full_name=str(row['ПІБ']).strip(),
-                        department=str(row['ВІДДІЛЕННЯ']).strip() if not pd.isna(row['ВІДДІЛЕННЯ']) else 'Не вказано',
-                        doctor=str(row['ЛІКАР']).strip() if not pd.isna(row['ЛІКАР']) else 'Не вказано',
-                        history_number=str(row['№ Історії']).strip(),
-                        comment=str(row['Коментар']).strip() if not pd.isna(row['Коментар']) else None,
-                        is_deceased=False,
-                        created_by=user.id
-                    )
-                    
-                    db.session.add(patient)
-                    success += 1
-                    print(f"✓ Рядок {index + 2}: {patient.full_name} - успішно додано")
-                    
-                except Exception as e:
-                    errors += 1
-                    print(f"❌ Рядок {index + 2}: Помилка - {str(e)}")
-                    continue
-            
-            # Збереження змін
-            db.session.commit()
-            
-            # Підсумок
-            print("\n" + "="*50)
-            print("📊 РЕЗУЛЬТАТИ ІМПОРТУ:")
-            print(f"✓ Успішно додано: {success}")
-            print(f"⚠️  Пропущено: {skipped}")
-            print(f"❌ Помилок: {errors}")
-            print(f"📋 Всього оброблено: {total}")
-            print("="*50)
+            result = import_patients(df, user_id=user.id)
             
         except FileNotFoundError:
             print(f"❌ Файл не знайдено: {excel_file_path}")
+            return
         except Exception as e:
             print(f"❌ Критична помилка: {str(e)}")
-            db.session.rollback()
+            return
+        
+        # Зауваження по рядках (перші 50)
+        issues = result.to_dict()['issues']
+        for issue in issues[:50]:
+            icon = '⚠️ ' if issue['kind'] == 'warning' else '⏭️ '
+            number = f" (№ {issue['history_number']})" if issue['history_number'] else ''
+            print(f"{icon} Рядок {issue['row']}{number}: {issue['reason']}")
+        if len(issues) > 50:
+            print(f"... та ще {len(issues) - 50} зауважень")
+        
+        # Підсумок
+        print("\n" + "="*50)
+        print("📊 РЕЗУЛЬТАТИ ІМПОРТУ:")
+        print(f"✓ Успішно додано: {result.inserted}")
+        print(f"⚠️  Пропущено: {result.skipped}")
+        print(f"⚠️  Попереджень: {result.warnings}")
+        print(f"📋 Всього оброблено: {result.total}")
+        print("="*50)
+        
+        return result
 
 
 if __name__ == '__main__':
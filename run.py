@@ -1,5 +1,17 @@
+import os
+import json
+from datetime import date
+import click
 from app import create_app, db
 from app.models import User, Patient
+from app.schema import upgrade_schema
+from app.search import rebuild_search_index
+from app.stats import rebuild_all as rebuild_monthly_stats
+from app.models import MonthlyStat
+from app.changes import iter_changes, to_dict
+from app.archive import archive_cutoff, archive_patients, pending_count, restore_patients
+from app.models import ArchivedPatient
+from app.queries import month_range
 
 app = create_app()
 
@@ -7,23 +19,99 @@ app = create_app()
 def make_shell_context():
     return {'db': db, 'User': User, 'Patient': Patient}
 
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Міграція існуючої бази: відсутні таблиці та індекси"""
+    created = upgrade_schema()
+    print(f'✓ Схему оновлено, нових колонок та індексів: {len(created)}')
+    init_monthly_stats()
+
+@app.cli.command('rebuild-search')
+def rebuild_search():
+    """Перебудова пошукового індексу пацієнтів"""
+    rebuild_search_index(db.engine)
+    print('✓ Пошуковий індекс перебудовано')
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    """Повний перерахунок місячної статистики"""
+    months = rebuild_monthly_stats()
+    print(f'✓ Статистику перераховано, місяців: {months}')
+
+@app.cli.command('changes')
+@click.option('--since', default=0, show_default=True, help='seq останньої прочитаної зміни')
+def changes(since):
+    """Журнал змін пацієнтів після seq у форматі JSON Lines (stdout)"""
+    for change in iter_changes(since):
+        click.echo(json.dumps(to_dict(change), ensure_ascii=False))
+
+@app.cli.command('archive')
+@click.option('--months', type=int, help='виписані давніше за стільки місяців (ARCHIVE_AFTER_MONTHS)')
+@click.option('--dry-run', is_flag=True, help='лише показати кількість')
+def archive(months, dry_run):
+    """Перенесення давно виписаних пацієнтів в архів (для запуску за розкладом)"""
+    months = months if months is not None else app.config['ARCHIVE_AFTER_MONTHS']
+    if dry_run:
+        print(f'Буде перенесено в архів: {pending_count(months)} (виписані до {archive_cutoff(months):%d.%m.%Y})')
+        return
+    moved = archive_patients(months)
+    print(f'✓ Перенесено в архів: {moved}')
+
+@app.cli.command('restore-archive')
+@click.option('--history-number', 'numbers', multiple=True, help='№ історії (можна кілька разів)')
+@click.option('--year', type=int, help='рік поступлення')
+@click.option('--month', type=click.IntRange(1, 12), help='місяць поступлення (разом з --year)')
+def restore_archive(numbers, year, month):
+    """Повернення пацієнтів з архіву в активну таблицю"""
+    if numbers:
+        condition = ArchivedPatient.history_number.in_(numbers)
+    elif year:
+        start, end = month_range(year, month) if month else (date(year, 1, 1), date(year + 1, 1, 1))
+        condition = db.and_(ArchivedPatient.admission_date >= start, ArchivedPatient.admission_date < end)
+    else:
+        raise click.UsageError('Вкажіть --history-number або --year [--month].')
+    restored, conflicts = restore_patients(condition)
+    print(f'✓ Повернено з архіву: {restored}')
+    for number in conflicts:
+        print(f'✗ № {number}: номер історії або id уже зайняті в активній таблиці, пацієнт лишився в архіві')
+
+def init_monthly_stats():
+    """Перший розрахунок статистики для бази, де вона ще порожня"""
+    if MonthlyStat.query.first() is None and Patient.query.first() is not None:
+        months = rebuild_monthly_stats()
+        print(f'✓ Розраховано статистику, місяців: {months}')
+
 def init_db():
     """Ініціалізація бази даних та створення адміністратора"""
     with app.app_context():
-        db.create_all()
+        # Створює відсутні таблиці та індекси (безпечно для існуючої бази)
+        created = upgrade_schema()
+        for name in created:
+            print(f"✓ Створено: {name}")
         
         # Перевірка чи існує адміністратор
-        admin = User.query.filter_by(username='admin').first()
+        username = os.environ.get('ADMIN_USERNAME', 'admin')
+        password = os.environ.get('ADMIN_PASSWORD', 'admin123')
+        admin = User.query.filter_by(username=username).first()
         if not admin:
-            admin = User(username='admin', role='admin')
-            admin.set_password('admin123')
+            admin = User(username=username, role='admin')
+            admin.set_password(password)
             db.session.add(admin)
             db.session.commit()
-            print('✓ Створено адміністратора: username=admin, password=admin123')
+            print(f'✓ Створено адміністратора: username={username}')
         else:
             print('✓ Адміністратор вже існує')
+        
+        init_monthly_stats()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Одноразова ініціалізація бази перед запуском сервера"""
+    init_db()
+    print('✓ База даних ініціалізована')
 
 if __name__ == '__main__':
+    # Сервер для розробки; у production - gunicorn (див. wsgi.py)
     init_db()
     print('✓ База даних ініціалізована')
     print('✓ Запуск сервера...')
@@ -0,0 +1,11 @@
+"""
+WSGI-точка входу для production-сервера:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+База даних тут не створюється - для цього є одноразова команда
+`flask --app run.py init-db`.
+"""
+from app import create_app
+
+app = create_app()